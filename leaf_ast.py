@@ -7,6 +7,52 @@ class BinaryOperation:
         self.token = operator
 
 
+class RangeExpression:
+    def __init__(self, *, token, start, stop, step=None):
+        self.token = token
+        self.start = start
+        self.stop = stop
+        self.step = step
+
+
+class InterpolatedString:
+    def __init__(self, token, parts):
+        self.token = token
+        # parts are python strs (literal text, or the str() of a constant
+        # expression) and expression nodes - neighbouring strs are joined
+        # here so only the expressions are left to evaluate
+        self.parts = []
+        for part in parts:
+            if (isinstance(part, str)
+                and self.parts
+                and isinstance(self.parts[-1], str)):
+                self.parts[-1] += part
+            elif part != '':
+                self.parts.append(part)
+
+
+class ListLiteral:
+    def __init__(self, token, items, constant, copied):
+        self.token = token
+        # 'constant' says which items are values that can't be changed -
+        # they are put in the template once, and only the other (slot)
+        # items are evaluated each time the literal is reached, into a copy
+        # of the template. 'copied' says which slots are values that can be
+        # changed in place (Strings), which are copied rather than shared
+        self.items = items
+        self.copied = copied
+        self.template = [item if is_constant else None
+                         for item, is_constant in zip(items, constant)]
+        self.slots = [(i, item, is_copied)
+                      for i, (item, is_constant, is_copied)
+                      in enumerate(zip(items, constant, copied))
+                      if not is_constant]
+        # unpacked items change the positions of the items after them, so
+        # those literals are built item by item instead
+        self.unpacking = any(type(item) == IterableUnpacking
+                             for item in items)
+
+
 class FunctionCall:
     def __init__(self, *,
                  function_node,   # Function obj
@@ -26,6 +72,12 @@ class Return:
         self.expression = expression
 
 
+class Yield:
+    def __init__(self, token, expression):
+        self.token = token
+        self.expression = expression
+
+
 class LoopControl:
     def __init__(self, token):
         self.token = token
@@ -91,6 +91,57 @@ class Lexer:
 
         return result  # already a string
 
+    def collect_interpolated_string(self):
+        # f'total: {a + b}!' -> ['total: ', 'a + b', '!'] - literal text
+        # and expression source alternate, starting and ending with text.
+        # {{ and }} are literal braces
+        parts = []
+        result = ''
+        self.advance()    # skip f
+        self.advance()    # skip quote '
+        while (self.current_char is not None
+               and self.current_char in string_characters):
+            if (self.current_char == '\\'
+                and self.peek(1) == '\\'):
+                result += '\\'
+                self.advance()
+
+            elif (self.current_char == '\\'
+                  and self.peek(1) == 'n'):
+                result += '\n'
+                self.advance()
+
+            elif (self.current_char in '{}'
+                  and self.peek(1) == self.current_char):
+                result += self.current_char
+                self.advance()
+
+            elif self.current_char == '{':
+                self.advance()
+                parts.append(result)
+                result = ''
+                while self.current_char not in ('}', '\'', '\n', None):
+                    result += self.current_char
+                    self.advance()
+                if self.current_char != '}' or not result.strip():
+                    self.raise_error(repr(self.current_char))
+                parts.append(result)
+                result = ''
+
+            elif self.current_char == '}':
+                self.raise_error('}')
+
+            else:
+                result += self.current_char
+            self.advance()
+
+        if not self.current_char == '\'':
+            self.raise_error(repr(self.current_char))
+        self.advance()
+
+        parts.append(result)
+        return parts
+
     def newline(self):
         while self.current_char in ('\n', ';'):
             self.advance()
@@ -139,6 +190,10 @@ class Lexer:
             elif self.current_char in digits:
                 token = Token(NUM, self.collect_number())
 
+            elif (self.current_char == 'f'         # interpolated strings
+                  and self.peek(1) == '\''):      # before identifiers
+                token = Token(FSTR, self.collect_interpolated_string())
+
             elif self.current_char in letters_under:  # can't start
                 token = self.identifier()              # with number
 
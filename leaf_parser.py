@@ -2,6 +2,7 @@
 
 from leaf_tokens import *
 from leaf_ast import *
+from leaf_lexer import Lexer
 from leaf_types_interpreter import *
 
 
@@ -125,6 +126,9 @@ class Parser:
         elif token.type == RETURN:
             node = self.return_statement()
 
+        elif token.type == YIELD:
+            node = self.yield_statement()
+
         elif token.type in (NEXT, BREAK):
             node = LoopControl(self.current_token)
             self.consume_token(token.type)
@@ -261,6 +265,19 @@ class Parser:
 
         return node
 
+    def yield_statement(self):
+        token = self.current_token
+        self.consume_token(YIELD)
+        if self.current_token.type in (NEWLINE, EOF):
+            node = Yield(token, None)
+
+        else:
+            self.consume_token(LBRACKET)
+            node = Yield(token, self.expression())
+            self.consume_token(RBRACKET)
+
+        return node
+
     def function_parameters(self):
         args = []
         arbitrary = None
@@ -577,7 +594,7 @@ class Parser:
             return self.comparison()
 
     def comparison(self):
-        node = self.addition()
+        node = self.range_expression()
         while self.current_token.type in (EQUAL, N_EQUAL, L_EQUAL,
                                           G_EQUAL, LESS, GREATER):
             token = self.current_token
@@ -585,7 +602,24 @@ class Parser:
 
             node = BinaryOperation(left_node  = node,
                                    operator   = token,
-                                   right_node = self.addition())
+                                   right_node = self.range_expression())
+        return node
+
+    def range_expression(self):
+        node = self.addition()
+        if self.current_token.type == RANGE:
+            token = self.current_token
+            self.consume_token(RANGE)
+            stop = self.addition()
+            step = None
+            if self.current_token.type == RANGE:   # optional step
+                self.consume_token(RANGE)
+                step = self.addition()
+
+            node = RangeExpression(token = token,
+                                   start = node,
+                                   stop  = stop,
+                                   step  = step)
         return node
 
     def addition(self):
@@ -671,6 +705,10 @@ class Parser:
                 self.consume_token(STR)
                 node = String(token)
 
+            elif token.type == FSTR:
+                self.consume_token(FSTR)
+                node = self.interpolated_string(token)
+
             elif token.type == TRUE:
                 self.consume_token(TRUE)
                 node = true
@@ -710,6 +748,28 @@ class Parser:
 
         return node
 
+    def interpolated_string(self, token):
+        # the lexer leaves the source of each {expression}, so each one is
+        # parsed now with its own Parser, once
+        parts = []
+        for i, part in enumerate(token.value):
+            if i % 2 == 0:
+                parts.append(part)
+                continue
+
+            lexer = Lexer(part)
+            lexer.line = token.line
+            parser = Parser(lexer)
+            node = parser.expression()
+            if parser.current_token.type not in (EOF, NEWLINE):
+                parser.raise_error(parser.current_token)
+
+            if isinstance(node, (Number, String, Boolean, NoneObject)):
+                node = str(node)     # constant, so it's formatted once
+            parts.append(node)
+
+        return InterpolatedString(token, parts)
+
     def paren_expr(self):
         self.consume_token(LPAREN)
         node = self.expression()
@@ -717,10 +777,14 @@ class Parser:
         return node
 
     def enclosure(self):
+        token = self.current_token
         self.consume_token(LBRACKET)
 
         objects = self.arbitrary_argument_list()
-        node = List(Token(LIST, objects))
+        constant = [isinstance(item, (Number, Boolean, NoneObject))
+                    for item in objects]
+        copied = [isinstance(item, String) for item in objects]
+        node = ListLiteral(token, objects, constant, copied)
 
         self.consume_token(RBRACKET)
 
@@ -15,7 +15,24 @@ COLON = 'COLON'    #
 
 NUM = 'NUM'
 STR = 'STR'
+FSTR = 'FSTR'      # interpolated string f'...{expr}...'
 LIST = 'LIST'  # not actually used in lexical analysis
+ARRAY = 'ARRAY'
+MAP = 'MAP'
+GENERATOR = 'GENERATOR'
+MAPPED = 'MAPPED'
+FILTERED = 'FILTERED'
+SET = 'SET'
+REGEX = 'REGEX'
+MATCHES = 'MATCHES'
+FILE = 'FILE'
+BYTES = 'BYTES'
+ROWS = 'ROWS'
+DATABASE = 'DATABASE'
+RESULTS = 'RESULTS'
+TABLE = 'TABLE'
+DEQUE = 'DEQUE'
+HEAP = 'HEAP'
 NONE = 'NONE'
 
 TRUE = 'TRUE'      # true
@@ -69,10 +86,12 @@ FUNC = 'FUNC'
 ENDFUNC = 'ENDFUNC'    # functions
 DO = 'DO'
 RETURN = 'RETURN'
+YIELD = 'YIELD'
 
 
 object_types = [
     STR,
+    FSTR,
     NUM,
     LIST,      # things that can be evaluated
     NONE,
@@ -165,6 +184,7 @@ reserved_keywords = {
     'endfunction': Token(ENDFUNC, 'endfunction'),
     'do': Token(DO, 'do'),
     'return': Token(RETURN, 'return'),
+    'yield': Token(YIELD, 'yield'),
 
     'true': Token(TRUE, 'true'),
     'false': Token(FALSE, 'false'),
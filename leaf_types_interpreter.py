@@ -1,8 +1,25 @@
 """AST Interpreter for Leaf."""
 
+import re
+import csv
+import json
+import sqlite3
+import io
 import sys
+import mmap
+import atexit
+import weakref
+import heapq
 import decimal
+import operator
 import functools
+import itertools
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from leaf_ast import *
 from leaf_tokens import *
@@ -54,15 +71,18 @@ class ScopedSymbolTable:
         return self.symbols.items()
 
     def add_builtins(self):
-        for name, obj in builtins.items():
-            self[name] = obj
-
+        # builtins only live in the global scope - inner scopes find them
+        # through lookup, so a user's own name (e.g. 'map') isn't replaced
+        # by a builtin inside every loop and function body, or copied back
+        # out of loops over the user's value
         if self.enclosing_scope is not None:
             for key in interpreter_globals:
                 self.__setitem__(key, self.enclosing_scope[key],
                                  protected=True)
 
         else:
+            for name, obj in builtins.items():
+                self[name] = obj
             for key, value in interpreter_globals.items():
                 self.__setitem__(key, value, protected=True)
 
@@ -113,6 +133,7 @@ class Interpreter(NodeParser):
 
     def make_interactive(self):
         current_scope.__setitem__('__interactive__', true, protected=True)
+        output.line_buffered = True
 
     def parse_BinaryOperation(self, node):
         operator = node.op
@@ -178,14 +199,27 @@ class Interpreter(NodeParser):
                 r = false
             return r
 
-    def parse_FunctionCall(self, node):
+    def parse_FunctionCall(self, node, statement=False):
+        # 'statement' is True when the call is a statement on its own, so
+        # its return value isn't used
         # function = builtins.get(node.function)
         Interpreter.current_state.append('parse_FunctionCall')
         try:
-            obj = self.parse(node.function_node)
             if type(node.function_node) == AttributeAccess:
+                # the object is only parsed once, and its method is called
+                # straight from its namespace without binding a new one
                 actual_obj = self.parse(node.function_node.left)
-                # print(repr(actual_obj))
+                obj = self.attribute(actual_obj, node.function_node)
+            else:
+                obj = self.parse(node.function_node)
+            if isinstance(obj, (List, Range, Bytes)):
+                Interpreter.current_state.pop()
+                return self.subscript(obj, node)
+            args = list(node.args)
+            # the instance is added to a copy of the arguments so that the
+            # node can be evaluated again with a different instance
+            if type(node.function_node) == AttributeAccess:
+                pass
 
             elif isinstance(obj, BoundMethod):
                 # print('found bound method')
@@ -198,14 +232,18 @@ class Interpreter(NodeParser):
             if isinstance(obj, Method):
                 base_class = obj.cls  # the class in which the method is found
                 if not isinstance(actual_obj, type):
-                    if node.args:
-                        if not self.parse(node.args[0]) == actual_obj:
-                            node.args.insert(0, actual_obj)
-                    else:
-                        node.args.insert(0, actual_obj)
+                    args.insert(0, actual_obj)
 
                 function = base_class.__namespace__[obj.value]
 
+            elif isinstance(obj, type):
+                # a type called directly, e.g. Number['5'] - it is
+                # swapped for the type's 'function' below
+                function = obj
+
+            elif isinstance(obj, RecordType):
+                function = obj      # record types don't need a name in scope
+
             else:
                 function = current_scope[str(obj.value)]
 
@@ -216,14 +254,17 @@ class Interpreter(NodeParser):
                              node.function_node,
                              parse=True)
 
-        if function in builtin_types.values():
+        if (isinstance(function, type)
+            and function in builtin_types.values()):
+            # only types are compared, since comparing anything else with
+            # each builtin type goes through MetaType.__eq__
             function = function.function
 
-        args = node.args
         new_args = {}
         modifiers = node.modifiers
         new_modifiers = {}
-        flags = node.flags  # already string-only guaranteed by parser
+        flags = dict(node.flags)  # already string-only guaranteed by parser
+        # copied so that the defaults added below don't change the node
 
         # if not isinstance(function, leaf_builtins.Function):
         #     raise TypeError('{} is not a function'.format(function
@@ -233,8 +274,7 @@ class Interpreter(NodeParser):
         results = []
         for i, arg in enumerate(args):
             if type(arg) == IterableUnpacking:
-                r = self.parse(arg)
-                results.extend([arg for arg in r])
+                results.extend(self.unpack(arg))
             else:
                 results.append(arg)
         # print('\n\n\n', '\n'.join(str(i) for i in results))
@@ -295,6 +335,10 @@ class Interpreter(NodeParser):
                 if flag not in flags:
                     flags[flag] = false
 
+            if statement and 'no_return' in flags:
+                # e.g. show as a statement doesn't need to make a String
+                flags['no_return'] = true
+
             for name, arg in new_args.items():
                 if isinstance(arg, list):
                     arg = [self.parse(i) for i in arg]
@@ -319,6 +363,67 @@ class Interpreter(NodeParser):
                                  function)
             return r
 
+    def subscript(self, obj, node):
+        # 'x[index]' gets an item and 'x[start, stop]' or
+        # 'x[start, stop, step]' gets a slice which shares x's items
+        for name in list(node.modifiers) + list(node.flags):
+            self.unexpected('modifier', name, node.function_node)
+
+        bounds = []
+        for arg in node.args:
+            if type(arg) == IterableUnpacking:
+                bounds.extend(self.unpack(arg))
+            else:
+                bounds.append(self.parse(arg))
+
+        for i, bound in enumerate(bounds):
+            if isinstance(bound, NoneObject):
+                bounds[i] = None
+            elif (isinstance(bound, Number)
+                  and not isinstance(bound, Boolean)
+                  and bound.is_integer()):
+                bounds[i] = int(bound)
+            else:
+                self.raise_error(TypeError, '{} indices must be integer '
+                                 'Numbers or none, got {}'
+                                 .format(obj.__class__.__name__,
+                                         bound.__class__.__name__),
+                                 node.function_node)
+
+        if len(bounds) == 1 and bounds[0] is not None:
+            return obj.item(bounds[0])
+        elif len(bounds) in (2, 3):
+            if len(bounds) == 3 and bounds[2] == 0:
+                self.raise_error(TypeError, 'slice step cannot be zero',
+                                 node.function_node)
+            return obj.slice(*bounds)
+
+        self.raise_error(TypeError, 'expected an index or 2-3 slice '
+                         'bounds, got {} arguments'.format(len(bounds)),
+                         node.function_node)
+
+    def parse_InterpolatedString(self, node):
+        # a single join of the already formatted constant parts and the
+        # str() of each expression
+        return String(Token(STR, ''.join([part if isinstance(part, str)
+                                          else str(self.parse(part))
+                                          for part in node.parts])))
+
+    def parse_RangeExpression(self, node):
+        bounds = [self.parse(node.start), self.parse(node.stop)]
+        if node.step is not None:
+            bounds.append(self.parse(node.step))
+
+        for bound in bounds:
+            if not isinstance(bound, Number):
+                self.raise_error(TypeError, 'Range bounds must be Numbers, '
+                                 'got {}'.format(bound.__class__.__name__),
+                                 node)
+        try:
+            return Range(*[bound.value for bound in bounds])
+        except TypeError as e:
+            self.raise_error(TypeError, str(e), node)
+
     def parse_Number(self, node):
         return node
 
@@ -329,23 +434,44 @@ class Interpreter(NodeParser):
         return node
 
     def parse_List(self, node):
-        results = []
-        for value in node.value:
-            if type(value) == IterableUnpacking:
-                results.extend(self.parse(value))
-            else:
-                results.append(self.parse(value))
-        node.value = results
         return node
 
+    def parse_ListLiteral(self, node):
+        # every evaluation gives a new List, so a literal in a loop or a
+        # function body is never shared between its results
+        # (String items are copied, as a String can be changed in place)
+        if node.unpacking:
+            values = []
+            for item, is_copied in zip(node.items, node.copied):
+                if type(item) == IterableUnpacking:
+                    values.extend(self.unpack(item))
+                elif is_copied:
+                    values.append(String(Token(STR, item.value)))
+                else:
+                    values.append(self.parse(item))
+        else:
+            values = node.template.copy()
+            for i, item, is_copied in node.slots:
+                if is_copied:
+                    values[i] = String(Token(STR, item.value))
+                else:
+                    values[i] = self.parse(item)
+        return List(Token(LIST, values))
+
     def parse_IterableUnpacking(self, node):
-        r = List(Token(LIST, [i for i in self.parse(node.expression)]))
+        r = List(Token(LIST, list(self.unpack(node))))
         # node.expression must is either a List object or
         # a Variable object whose value is a list.
         # So parsing it returns the iterable.
         # Then we iterate over it
         return r
 
+    def unpack(self, node):
+        # iterates over ':expression' one item at a time - where the items
+        # are used straight away (e.g. in a for loop or as arguments) there
+        # is no need to collect them into a List first
+        return iter(self.parse(node.expression))
+
     def parse_UnaryOperation(self, node):
         operator = node.op.type
         if operator == ADD:
@@ -374,23 +500,22 @@ class Interpreter(NodeParser):
                 return r
 
             else:
-                r = self.parse(child)
+                if isinstance(child, FunctionCall):
+                    r = self.parse_FunctionCall(child, statement=True)
+                else:
+                    r = self.parse(child)
                 if isinstance(r, LoopControl):
                     # handle next statements that occur in if statements
                     Interpreter.current_state.pop()
                     return r
 
-                if (isinstance(child, FunctionCall)
-                    and self.parse(child.function_node).value == 'show'):
-                    r = none
-                    continue
-
                 if (not isinstance(r, NoneObject)
                     and current_scope['__interactive__']
                     and r is not None
                     and current_scope.scope_name != 'user function call'
                     and not isinstance(r, LoopControl)):
                     # print('printing:', repr(r))
+                    output.flush()
                     print(r)
         Interpreter.current_state.pop()
         return r
@@ -442,9 +567,29 @@ class Interpreter(NodeParser):
                                           current_scope)
         # 'outer scope' is the enclosing scope of the foor loop
 
-        iterable = self.parse(node.iterable)
+        if type(node.iterable) == IterableUnpacking:
+            iterable = self.parse(node.iterable.expression)
+            # each item is unpacked as it is reached rather than
+            # unpacking the whole iterable first
+        else:
+            iterable = self.parse(node.iterable)
         # print('iterable', '\n'.join(repr(i) for i in iterable))
-        iterator = iter(iterable)
+        if (isinstance(iterable, Range)
+            and type(node.iterable) != IterableUnpacking
+            and len(node.parameters) == 1):
+            # fast path: step a python counter instead of going through
+            # the general iterator and parameter checks
+            name = node.parameters[0].value
+            for value in iterable.values():
+                current_scope.__setitem__(name, Number(Token(NUM, value)),
+                                          protected=True)
+                r = self.parse(node.block)
+                if (isinstance(r, LoopControl)
+                    and r.token.type == BREAK):
+                    break
+            iterator = iter(())   # nothing left for the general loop
+        else:
+            iterator = iter(iterable)
 
         while True:
             try:
@@ -503,58 +648,87 @@ class Interpreter(NodeParser):
             current_scope[name] = self.parse(node.right)
 
     def parse_MultipleAssign(self, node):
+        # the values are collected once and then spread over the variables
+        # by position - when a single ':iterable' is spread over exactly one
+        # ':variable', only the items around it are taken, and that variable
+        # gets the rest as a view of a List or Range (so its type is the
+        # source's) or, for any other iterable, a Chain of what is left,
+        # which is only read as it is iterated over if nothing follows it
         global current_scope
         variables = node.variables
         names = [var.expression.value
                  if type(var) == IterableUnpacking else var.value
                  for var in variables]
-        args = []
-
-        for arg in node.arguments:
-            if type(arg) == IterableUnpacking:
-                args.extend(self.parse(arg))
+        unpacked = [i for i, var in enumerate(variables)
+                    if type(var) == IterableUnpacking]
+        normal = len(variables) - len(unpacked)
+
+        arguments = node.arguments
+        if (len(unpacked) == 1 and len(arguments) == 1
+                and type(arguments[0]) == IterableUnpacking):
+            position = unpacked[0]
+            after = len(variables) - position - 1
+            iterable = self.parse(arguments[0].expression)
+
+            if isinstance(iterable, (List, Range)):
+                length = len(iterable)
+                if length < normal:
+                    self.raise_error(TypeError, 'expected {} values, got {}'
+                                     .format(normal, length),
+                                     node)
+                values = ([iterable.item(i) for i in range(position)]
+                          + [iterable.slice(position, length - after)]
+                          + [iterable.item(i)
+                             for i in range(length - after, length)])
             else:
-                args.append(self.parse(arg))
-
-        original_length = len(args)
-        unpacked = []
-        normal = []
-        accumulated_values = {}
-        for var in variables:
-            if type(var) == IterableUnpacking:
-                unpacked.append(var.expression.value)
-                accumulated_values[var.expression.value] = List(Token(LIST,
-                                                                      []))
+                items = iter(iterable)
+                values = list(itertools.islice(items, position))
+                count = len(values)
+                if after:
+                    rest = list(items)
+                    count += len(rest)
+                    middle = List(Token(LIST, rest[:len(rest) - after]))
+                    values.append(Chain([middle]))
+                    values.extend(rest[len(rest) - after:])
+                else:
+                    values.append(Chain([items]))
+                if count < normal:
+                    self.raise_error(TypeError, 'expected {} values, got {}'
+                                     .format(normal, count),
+                                     node)
+
+            for name, value in zip(names, values):
+                current_scope[name] = value
+            return
+
+        values = []
+        for arg in arguments:
+            if type(arg) == IterableUnpacking:
+                values.extend(self.unpack(arg))
             else:
-                normal.append(var.value)
-                accumulated_values[var.value] = None
+                values.append(self.parse(arg))
 
-        if unpacked:
-            each, last = divmod(len(args) - len(normal), len(unpacked))
-            chunks = [each for _ in range(len(unpacked))]
-            for i in range(last):
-                chunks[i] += 1
-
-        if len(args) < len(normal):
+        if len(values) < normal or (not unpacked and len(values) > normal):
             self.raise_error(TypeError, 'expected {} values, got {}'
-                             .format(len(normal), len(args)),
+                             .format(normal, len(values)),
                              node)
 
-        for var in variables:
+        if unpacked:
+            each, extra = divmod(len(values) - normal, len(unpacked))
+
+        position = 0
+        chunk = 0
+        for name, var in zip(names, variables):
             if type(var) == IterableUnpacking:
-                for _ in range(chunks.pop(0)):
-                    (accumulated_values[var.expression.value]
-                        .value.extend(self.parse(args.pop(0))))
+                size = each + (chunk < extra)
+                chunk += 1
+                current_scope[name] = List(Token(LIST,
+                                                 values[position:
+                                                        position + size]))
+                position += size
             else:
-                accumulated_values[var.value] = self.parse(args.pop(0))
-
-        if args:  # if all of the values haven't been used up
-            self.raise_error(TypeError, 'expected {} values, got {}'
-                             .format(len(normal), original_length),
-                             node)
-
-        for name, value in accumulated_values.items():
-            current_scope[name] = value
+                current_scope[name] = values[position]
+                position += 1
 
     def parse_FunctionDefinition(self, node):
         global current_scope
@@ -562,7 +736,11 @@ class Interpreter(NodeParser):
         modifiers = {k: self.parse(v)
                      for k, v in node.modifiers.items()}
         flags = node.flags
-        function = UserFunction(token     = node.token,
+        if self.contains_yield(node.body):
+            function_type = GeneratorFunction
+        else:
+            function_type = UserFunction
+        function = function_type(token     = node.token,
                                 arg_names = arg_names,
                                 arbitrary = node.arbitrary,
                                 modifiers = modifiers,
@@ -570,6 +748,21 @@ class Interpreter(NodeParser):
                                 body      = node.body)
         current_scope[node.value] = function
 
+    def contains_yield(self, node):
+        # doesn't look inside nested function definitions, since a 'yield'
+        # in those makes the nested function a generator instead
+        if isinstance(node, Yield):
+            return True
+        elif isinstance(node, StatementList):
+            return any(self.contains_yield(child) for child in node.children)
+        elif isinstance(node, IfStatement):
+            blocks = [node.block, *(node.elif_blocks or []), node.else_block]
+            return any(self.contains_yield(block) for block in blocks
+                       if block is not None)
+        elif isinstance(node, (WhileLoop, ForLoop)):
+            return self.contains_yield(node.block)
+        return False
+
     def parse_Variable(self, node):
         global current_scope
         name = node.value
@@ -595,6 +788,109 @@ class Interpreter(NodeParser):
 
         return self.parse(node.expression)
 
+    def parse_Yield(self, node):
+        # the bodies of functions containing 'yield' are run by 'run'
+        # instead, so this is only reached outside of a function
+        self.raise_error(SyntaxError, '\'yield\' must be placed inside a '
+                         'function', node)
+
+    # Generator functions run their body with 'run', which works like
+    # 'parse' but is a python generator yielding the values of the body's
+    # 'yield' statements. Only statements that can contain a 'yield' have
+    # their own 'run_' method - everything else is parsed as normal.
+
+    def run(self, node):
+        method = getattr(self, 'run_{}'.format(node.__class__.__name__),
+                         None)
+        if method is None:
+            return self.parse(node)
+        return (yield from method(node))
+
+    def run_Yield(self, node):
+        if node.expression is None:
+            yield none
+        else:
+            yield self.parse(node.expression)
+        return none
+
+    def run_Return(self, node):
+        raise GeneratorReturn()
+
+    def run_StatementList(self, node):
+        r = none
+        for child in node.children:
+            if isinstance(child, LoopControl):
+                return child
+            if isinstance(child, FunctionCall):
+                r = self.parse_FunctionCall(child, statement=True)
+            else:
+                r = yield from self.run(child)
+            if isinstance(r, LoopControl):
+                return r
+        return r
+
+    def run_IfStatement(self, node):
+        if bool(self.parse(node.expression)):
+            return (yield from self.run(node.block))
+
+        for expr, block in zip(node.elif_expressions or [],
+                               node.elif_blocks or []):
+            if bool(self.parse(expr)):
+                return (yield from self.run(block))
+
+        if node.else_block:
+            return (yield from self.run(node.else_block))
+        return none
+
+    def run_WhileLoop(self, node, negate=False):
+        while bool(self.parse(node.expression)) != negate:
+            r = yield from self.run(node.block)
+            if (isinstance(r, LoopControl)
+                and r.token.type == BREAK):
+                break
+        return none
+
+    def run_UntilLoop(self, node):
+        return (yield from self.run_WhileLoop(node, negate=True))
+
+    def run_ForLoop(self, node):
+        global current_scope
+        outer_scope = current_scope
+        current_scope = ScopedSymbolTable('for loop',
+                                          current_scope.scope_level + 1,
+                                          current_scope)
+
+        unpack = type(node.iterable) == IterableUnpacking
+        if unpack:
+            iterable = self.parse(node.iterable.expression)
+        else:
+            iterable = self.parse(node.iterable)
+
+        for item in iterable:
+            args = list(item) if unpack else [item]
+            if len(args) != len(node.parameters):
+                self.raise_error(NameError, '{} returns {} values per '
+                                 'iteration'
+                                 .format(iterable.__class__.__name__,
+                                        len(args)),
+                                 node.iterable)
+
+            for arg, param in zip(args, node.parameters):
+                current_scope.__setitem__(param.value, arg, protected=True)
+
+            r = yield from self.run(node.block)
+            # the Generator makes sure current_scope is this loop's scope
+            # again whenever the body is resumed after a 'yield'
+            if (isinstance(r, LoopControl)
+                and r.token.type == BREAK):
+                break
+
+        for name, value in current_scope.items():
+            outer_scope.__setitem__(name, value, protected=True)
+
+        current_scope = outer_scope
+        return none
+
     def parse_LoopControl(self, node):
         f = not any(i in Interpreter.current_state
                    for i in ('parse_ForLoop',
@@ -606,12 +902,16 @@ class Interpreter(NodeParser):
         return node
 
     def parse_AttributeAccess(self, node):
-        obj = self.parse(node.left)
-        attr = node.name
-        # print(obj.__namespace__)
+        attribute = self.attribute(self.parse(node.left), node)
+        if isinstance(attribute, BoundMethod):
+            attribute = attribute.bind()    # it may outlive the object
+        return attribute
 
+    def attribute(self, obj, node):
+        # the attribute 'node.name' of the already parsed 'obj'
+        attr = node.name
         try:
-            attribute = obj.__namespace__[attr]
+            return obj.__namespace__[attr]
         except KeyError:
             if not isinstance(obj, type):
                 obj = obj.__class__
@@ -619,8 +919,6 @@ class Interpreter(NodeParser):
                              .format(repr(attr), obj.__name__),
                              node.left, parse=True)
 
-        return attribute
-
     def parse_NoneObject(self, node):
         try:
             self.raise_error(TypeError,
@@ -641,6 +939,60 @@ class Interpreter(NodeParser):
     def parse_Chain(self, node):
         return node
 
+    def parse_Array(self, node):
+        return node
+
+    def parse_Map(self, node):
+        return node
+
+    def parse_Set(self, node):
+        return node
+
+    def parse_Range(self, node):
+        return node
+
+    def parse_Generator(self, node):
+        return node
+
+    def parse_Mapped(self, node):
+        return node
+
+    def parse_Filtered(self, node):
+        return node
+
+    def parse_Regex(self, node):
+        return node
+
+    def parse_Matches(self, node):
+        return node
+
+    def parse_File(self, node):
+        return node
+
+    def parse_Bytes(self, node):
+        return node
+
+    def parse_Rows(self, node):
+        return node
+
+    def parse_Database(self, node):
+        return node
+
+    def parse_Results(self, node):
+        return node
+
+    def parse_Table(self, node):
+        return node
+
+    def parse_Record(self, node):
+        return node
+
+    def parse_Deque(self, node):
+        return node
+
+    def parse_Heap(self, node):
+        return node
+
     def unexpected(self, name, value, obj):
         self.raise_error(SyntaxError, 'unexpected {}: {}'.format(name, value),
                          obj)
@@ -725,14 +1077,8 @@ class Type(Interpreter, metaclass=MetaType):
                                                  .__class__.__name__))
 
     def zip_longest(self, iterables, pad):
-        def gen_values(i):
-            for item in i:
-                yield item
-            while True:
-                yield pad
-        generators = [gen_values(i) for i in iterables]
-        for _ in range(max(len(i) for i in iterables)):
-            yield [next(generator) for generator in generators]
+        # doesn't need the lengths of the iterables, so they can be lazy
+        return itertools.zip_longest(*iterables, fillvalue=pad)
 
     def __repr__(self):
         return '{}({})'.format(self.__class__.__name__, repr(self.token))
@@ -746,13 +1092,84 @@ class Type(Interpreter, metaclass=MetaType):
             return 'Indexed[{}]'.format(str(self.iterable))
 
         elif isinstance(self, (Parallel, Chain)):
+            # the rest of an unpacked iterable isn't shown, as that would
+            # use it up
             return '{}[{}]'.format(self.__class__.__name__,
                                     ', '.join([str(i)
+                                               if isinstance(i, Type)
+                                               else '...'
                                          for i in self.iterables]))
 
         elif isinstance(self, Boolean):
             return 'false' if int(self.value) == 0 else 'true'
 
+        elif isinstance(self, Array):
+            return 'Array[{}]'.format(str(from_ndarray(self.value)))
+
+        elif isinstance(self, Range):
+            if self.step == 1:
+                return '{} >> {}'.format(self.start, self.stop)
+            return '{} >> {} >> {}'.format(self.start, self.stop, self.step)
+
+        elif isinstance(self, Generator):
+            return '<generator {}>'.format(self.function.value)
+
+        elif isinstance(self, Mapped):
+            return 'map[{}, {}]'.format(self.function.value,
+                                        ', '.join(str(i)
+                                                  for i in self.iterables))
+
+        elif isinstance(self, Filtered):
+            return 'filter[{}, {}]'.format(self.function.value,
+                                           self.iterable)
+
+        elif isinstance(self, Set):
+            return 'Set[{}]'.format(', '.join(str(item)
+                                              for item in self.value))
+
+        elif isinstance(self, Deque):
+            return 'Deque[{}]'.format(', '.join(str(item)
+                                                for item in self.value))
+
+        elif isinstance(self, Heap):
+            return 'Heap[{}]'.format(', '.join(str(item)
+                                               for item in self))
+
+        elif isinstance(self, Regex):
+            return "Regex['{}']".format(self.value.pattern)
+
+        elif isinstance(self, Matches):
+            return '<matches of {}>'.format(self.regex)
+
+        elif isinstance(self, File):
+            return "File['{}']".format(self.value)
+
+        elif isinstance(self, Bytes):
+            return '<Bytes of length {}>'.format(len(self.value))
+
+        elif isinstance(self, Rows):
+            return '<rows of {}>'.format(self.value)
+
+        elif isinstance(self, Database):
+            return "Database['{}']".format(self.value)
+
+        elif isinstance(self, Table):
+            return '<Table of {} rows: {}>'.format(self.length,
+                                                   ', '.join(self.value))
+
+        elif isinstance(self, Record):
+            return '{}[{}]'.format(self.record_type.value,
+                                   ', '.join(str(value)
+                                             for value in self.value))
+
+        elif isinstance(self, Results):
+            return '<results of {}>'.format(self.database)
+
+        elif isinstance(self, Map):
+            return 'Map[{}]'.format(', '.join('[{}, {}]'.format(key, value)
+                                              for key, value
+                                              in self.value.items()))
+
         return str(self.value)
 
     def unsupported_binary_op(self, op, obj1, obj2):
@@ -788,6 +1205,10 @@ class Type(Interpreter, metaclass=MetaType):
             new_values = values_1 + values_2
             return List(Token(LIST, new_values))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.add, self, other)
+
         else:
             # self.unsupported_binary_op('+', self, other)
             return NotImplemented
@@ -799,6 +1220,10 @@ class Type(Interpreter, metaclass=MetaType):
             val_2 = other.value
             return Number(Token(NUM, val_1 - val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.sub, self, other)
+
         else:
             # self.unsupported_binary_op('-', self, other)
             return NotImplemented
@@ -854,6 +1279,10 @@ class Type(Interpreter, metaclass=MetaType):
             val_2 = int(other.value)  # number
             return List(Token(LIST, values_1 * val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.mul, self, other)
+
         else:
             # self.unsupported_binary_op('*', self, other)
             return NotImplemented
@@ -867,6 +1296,10 @@ class Type(Interpreter, metaclass=MetaType):
                 raise ZeroDivisionError('attempted division by zero')
             return Number(Token(NUM, val_1 / val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.truediv, self, other)
+
         else:
             # self.unsupported_binary_op('/', self, other)
             return NotImplemented
@@ -879,6 +1312,10 @@ class Type(Interpreter, metaclass=MetaType):
                 raise ZeroDivisionError('attempted floor division by zero')
             return Number(Token(NUM, val_1 // val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.floordiv, self, other)
+
         else:
             # self.unsupported_binary_op('//', self, other)
             return NotImplemented
@@ -893,6 +1330,10 @@ class Type(Interpreter, metaclass=MetaType):
             val_2 = other.value
             return Number(Token(NUM, val_1 ** val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.pow, self, other)
+
         else:
             # self.unsupported_binary_op('^', self, other)
             return NotImplemented
@@ -906,11 +1347,20 @@ class Type(Interpreter, metaclass=MetaType):
                 raise ZeroDivisionError('attempted modulo by zero')
             return Number(Token(NUM, val_1 % val_2))
 
+        elif (isinstance(other, Array)
+              or isinstance(self, Array)):
+            return array_operation(operator.mod, self, other)
+
+        else:
+            # self.unsupported_binary_op('%', self, other)
+            return NotImplemented
+
     # Comparison methods
 
     def __eq__(self, other):
-        if (isinstance(other, (String, Number, Boolean, List))
-            and isinstance(self, (String, Number, Boolean, List))):
+        if (isinstance(other, (String, Number, Boolean, List, Bytes, Deque))
+            and isinstance(self, (String, Number, Boolean, List, Bytes,
+                                  Deque))):
             val_1 = self.value
             val_2 = other.value
             if val_1 == val_2:
@@ -918,11 +1368,27 @@ class Type(Interpreter, metaclass=MetaType):
             else:
                 r = false
 
-        elif (isinstance(other, (Indexed, Parallel))
-              and isinstance(self, (Indexed, Parallel))):
+        elif (isinstance(other, (Indexed, Parallel, Range))
+              and isinstance(self, (Indexed, Parallel, Range))):
             r = other.value == self.value and type(other) == type(self)
             r = true if r else false
 
+        elif (isinstance(other, Array)
+              and isinstance(self, Array)):
+            r = true if numpy.array_equal(self.value, other.value) else false
+
+        elif (isinstance(other, Record)
+              and isinstance(self, Record)):
+            r = (self.record_type is other.record_type
+                 and self.value == other.value)
+            r = true if r else false
+
+        elif ((isinstance(other, Map)
+               and isinstance(self, Map))
+              or (isinstance(other, Set)
+                  and isinstance(self, Set))):
+            r = true if self.value == other.value else false
+
         elif (isinstance(other, NoneObject)
               and isinstance(self, NoneObject)):
             r = true
@@ -948,9 +1414,9 @@ class Type(Interpreter, metaclass=MetaType):
 
     def __ne__(self, other):
         if (isinstance(other, (String, Number, Boolean,
-                               List))
+                               List, Bytes, Deque))
             and isinstance(self, (String, Number, Boolean,
-                                  List))):
+                                  List, Bytes, Deque))):
             val_1 = self.value
             val_2 = other.value
             if val_1 != val_2:
@@ -958,11 +1424,27 @@ class Type(Interpreter, metaclass=MetaType):
             else:
                 r = false
 
-        elif (isinstance(other, (Indexed, Parallel))
-              and isinstance(self, (Indexed, Parallel))):
+        elif (isinstance(other, (Indexed, Parallel, Range))
+              and isinstance(self, (Indexed, Parallel, Range))):
             r = other.value != self.value and type(other) == type(self)
             r = true if r else false
 
+        elif (isinstance(other, Array)
+              and isinstance(self, Array)):
+            r = false if numpy.array_equal(self.value, other.value) else true
+
+        elif (isinstance(other, Record)
+              and isinstance(self, Record)):
+            r = (self.record_type is not other.record_type
+                 or self.value != other.value)
+            r = true if r else false
+
+        elif ((isinstance(other, Map)
+               and isinstance(self, Map))
+              or (isinstance(other, Set)
+                  and isinstance(self, Set))):
+            r = true if self.value != other.value else false
+
         elif (isinstance(other, NoneObject)
               and isinstance(self, NoneObject)):
             r = false
@@ -1047,6 +1529,9 @@ class Type(Interpreter, metaclass=MetaType):
         if isinstance(self, Number):
             return Number(Token(self.token.type, -self.value))
 
+        elif isinstance(self, Array):
+            return Array(-self.value)
+
         else:
             # self.unsupported_unary_op('+', self)
             return NotImplemented
@@ -1055,11 +1540,23 @@ class Type(Interpreter, metaclass=MetaType):
         if isinstance(self, Number):
             return Number(Token(self.token.type, +self.value))
 
+        elif isinstance(self, Array):
+            return Array(+self.value)
+
         else:
             # self.unsupported_unary_op('+', self)
             return NotImplemented
 
     def __hash__(self):
+        if isinstance(self, (Number, String, NoneObject)):
+            # equal values must hash the same to be used as Map keys
+            return hash(self.value)
+        if isinstance(self, List):
+            # only the unchangeable copies Sets keep (see set_key) can be
+            # hashed, by their items
+            if not self.frozen:
+                raise TypeError('a List cannot be hashed')
+            return hash(tuple(self))
         return hash(self.token)
 
     __radd__ = __add__
@@ -1073,11 +1570,25 @@ class Type(Interpreter, metaclass=MetaType):
     def __bool__(self):
         if isinstance(self, NoneObject):
             return False
+        elif isinstance(self, Array):
+            return self.value.size > 0
+        elif isinstance(self, (Range, Table)):
+            return len(self) > 0
         return bool(self.value)
 
     def __len__(self):
         if isinstance(self, Number):
             return len(str(self.value).replace('.', ''))
+        elif isinstance(self, Array):
+            return self.value.shape[0] if self.value.ndim else 1
+        elif isinstance(self, List):
+            return len(self.positions())
+        elif isinstance(self, Range):
+            return self.length
+        elif isinstance(self, Table):
+            return self.length
+        elif isinstance(self, Generator):
+            raise TypeError('Generator has no length')
         return len(self.value)
 
     def __getitem__(self, key):
@@ -1126,14 +1637,107 @@ class Type(Interpreter, metaclass=MetaType):
                 yield Number(Token(NUM, decimal.Decimal(digit)))
 
         elif isinstance(self, List):
-            for item in self.value:
-                # items are already generic Leaf types
-                yield item
+            if self.indices is None:
+                yield from self.buffer
+            else:
+                buffer = self.buffer
+                for i in self.indices:
+                    # items are already generic Leaf types
+                    yield buffer[i]
 
         elif isinstance(self, String):
             for char in self.value:
                 yield String(Token(STR, char))
 
+        elif isinstance(self, Range):
+            for value in self.values():
+                yield Number(Token(NUM, value))
+
+        elif isinstance(self, Generator):
+            # generators can only be iterated over once, like in python
+            yield from self.values
+
+        elif isinstance(self, Mapped):
+            call = self.call
+            for items in zip(*self.iterables):
+                yield call(*items)
+
+        elif isinstance(self, Filtered):
+            call = self.call
+            for item in self.iterable:
+                if call(item):
+                    yield item
+
+        elif isinstance(self, Set):
+            for item in list(self.value):
+                yield item
+
+        elif isinstance(self, Deque):
+            # a copy, so the Deque can be changed while iterating over it
+            yield from list(self.value)
+
+        elif isinstance(self, Heap):
+            # smallest first, without popping anything
+            for key, count, item in sorted(self.value):
+                yield item
+
+        elif isinstance(self, Map):
+            for key, value in list(self.value.items()):
+                yield List(Token(LIST, [key, value]))
+
+        elif isinstance(self, Bytes):
+            # each byte as a Number, straight from the memoryview
+            for byte in self.value:
+                yield Number(Token(NUM, decimal.Decimal(byte)))
+
+        elif isinstance(self, Rows):
+            yield from self.rows()
+
+        elif isinstance(self, Record):
+            # the fields' values, in order
+            yield from self.value
+
+        elif isinstance(self, Table):
+            # each row as a List, converted a column at a time
+            columns = [table_values(self.kinds[name], column)
+                       for name, column in self.value.items()]
+            for row in zip(*columns):
+                yield List(Token(LIST, list(row)))
+
+        elif isinstance(self, Results):
+            # results are fetched from the database in batches as they are
+            # iterated over, and can only be iterated over once
+            while True:
+                try:
+                    rows = self.cursor.fetchmany(Results.batch_size)
+                except sqlite3.Error as e:
+                    raise TypeError('database error: {}'.format(e)) from None
+                if not rows:
+                    break
+                for row in rows:
+                    yield List(Token(LIST, [from_sql(value)
+                                            for value in row]))
+
+        elif isinstance(self, File):
+            # reads a line at a time, without the newline, and closes the
+            # file once it has all been read
+            for line in self.reader():
+                yield String(Token(STR, File.strip(line)))
+            self.finish()
+
+        elif isinstance(self, Matches):
+            # finds each match as it is iterated over
+            for match in self.regex.value.finditer(self.string):
+                yield match_value(match)
+
+        elif isinstance(self, Array):
+            if self.value.ndim == 1:
+                for item in self.value.tolist():
+                    yield from_python_number(item)
+            else:
+                for row in self.value:
+                    yield Array(row)
+
         else:
             raise TypeError('{} is not iterable'.format(
                             self.__class__.__name__))
@@ -1187,7 +1791,8 @@ class Method(Function):
     def __init__(self, func, cls, arg_names=None,
                                   arbitrary=False,
                                   modifiers=None,
-                                  flags=None):
+                                  flags=None,
+                                  name=None):
         self.func = func
         self.cls = cls
 
@@ -1196,7 +1801,7 @@ class Method(Function):
         else:
             arg_names.insert(0, instance)
         super(Method, self).__init__(token     = Token(IDENTIFIER,
-                                                        func.__name__),
+                                                        name or func.__name__),
                                       arg_names = arg_names,
                                       arbitrary = arbitrary,
                                       modifiers = modifiers,
@@ -1211,15 +1816,34 @@ class Method(Function):
 
 
 class BoundMethod(Method):
-    def __init__(self, obj, method):
+    def __init__(self, obj, method, weak=False):
         method.arg_names.pop(0)
         super(BoundMethod, self).__init__(func = method.func,
                                      cls       = method.cls,
                                      arg_names = method.arg_names,
                                      arbitrary = method.arbitrary,
                                      modifiers = method.modifiers,
-                                     flags     = method.flags)
-        self.instance = obj
+                                     flags     = method.flags,
+                                     name      = method.value)
+        if weak:
+            # kept in the object's own Namespace, where a strong reference
+            # would make a cycle that only the garbage collector can free
+            self.strong, self.weak = None, weakref.ref(obj)
+        else:
+            self.strong, self.weak = obj, None
+
+    @property
+    def instance(self):
+        if self.weak is None:
+            return self.strong
+        return self.weak()
+
+    def bind(self):
+        # a BoundMethod which keeps its object alive, for when the method
+        # is used as a value (e.g. 'upper << s.uppercase')
+        if self.weak is None:
+            return self
+        return BoundMethod(self.weak(), self.cls.__namespace__[self.value])
 
     def __str__(self):
         return '<bound method {} of {} type>'.format(self.value,
@@ -1229,13 +1853,36 @@ class BoundMethod(Method):
         return self.func(self, args, modifiers, flags)
 
 
+class Namespace(dict):
+    # an object's namespace, which binds a method of its type to it the
+    # first time the method is looked up rather than every method each
+    # time an object is made
+
+    def __init__(self, obj, cls):
+        super(Namespace, self).__init__()
+        self.obj = weakref.ref(obj)
+        # weak, like the methods bound here, so that an object and its
+        # namespace aren't a reference cycle
+        self.cls = cls
+
+    def __missing__(self, name):
+        method = BoundMethod(self.obj(), self.cls.__namespace__[name],
+                             weak=True)
+        self[name] = method
+        return method
+
+
 def objMethod(cls, *, arg_names=None,
                    arbitrary=False,
                    modifiers=None,
-                   flags=None):
+                   flags=None,
+                   name=None):
+    # 'name' is the method's name in Leaf if it differs from the python
+    # function's name (e.g. to avoid shadowing a python builtin)
 
     def wrapper(func):
-        return Method(func, cls, arg_names, arbitrary, modifiers, flags)
+        return Method(func, cls, arg_names, arbitrary, modifiers, flags,
+                      name)
 
     return wrapper
 
@@ -1267,34 +1914,10 @@ class UserFunction(Function):
     def __call__(self, args, modifiers, flags):
         global current_scope
         outer_scope = current_scope
-        current_scope = ScopedSymbolTable('user function call',
-                                          outer_scope.scope_level + 1,
-                                          outer_scope)
+        current_scope = self.function_scope(args, modifiers, flags)
         # print('entered scope:', current_scope.scope_name,
         #       current_scope.scope_level)
 
-        current_scope[self.token.value] = self
-
-        for name in self.modifiers.keys():
-            modifiers[name] = self.get_modifier(modifiers, name)
-
-        if self.arbitrary:
-            arbitrary_args = args[arbitrary]
-            del args[arbitrary]
-
-        for name in self.arg_names:
-            current_scope[name] = self.parse(args[name])
-
-        for name, value in flags.items():
-            current_scope[name] = value
-
-        for name, value in modifiers.items():
-            current_scope[name] = value
-
-        if self.arbitrary:
-            current_scope[self.arbitrary_name] = List(Token(LIST,
-                                                      arbitrary_args))
-
         # print('the scope contains:', str(current_scope), '\n\n\n')
 
         # print(args, end='\n\n')
@@ -1317,10 +1940,51 @@ class UserFunction(Function):
 
         return return_value
 
+    def function_scope(self, args, modifiers, flags):
+        # the scope of a call to the function, holding its arguments
+        scope = ScopedSymbolTable('user function call',
+                                  current_scope.scope_level + 1,
+                                  current_scope)
+
+        scope[self.token.value] = self
+
+        for name in self.modifiers.keys():
+            modifiers[name] = self.get_modifier(modifiers, name)
+
+        if self.arbitrary:
+            arbitrary_args = args[arbitrary]
+            del args[arbitrary]
+
+        for name in self.arg_names:
+            scope[name] = self.parse(args[name])
+
+        for name, value in flags.items():
+            scope[name] = value
+
+        for name, value in modifiers.items():
+            scope[name] = value
+
+        if self.arbitrary:
+            scope[self.arbitrary_name] = List(Token(LIST, arbitrary_args))
+
+        return scope
+
     def __str__(self):
         return '<user-defined function {}>'.format(self.value)
 
 
+class GeneratorFunction(UserFunction):
+    # a user-defined function containing 'yield' - calling it doesn't run
+    # its body, it returns a Generator which runs the body as it is
+    # iterated over
+
+    def __call__(self, args, modifiers, flags):
+        return Generator(self, self.function_scope(args, modifiers, flags))
+
+    def __str__(self):
+        return '<user-defined generator function {}>'.format(self.value)
+
+
 # builtin functions
 
 
@@ -1336,6 +2000,72 @@ class NoneObject(Type):
 none = NoneObject(Token(NONE, 'none'))
 
 
+class OutputBuffer:
+    # collects the text written by show and writes it to its stream in
+    # chunks of at least 'size' characters, or after each line if it is
+    # line buffered (as stdout is in the interactive prompt)
+
+    def __init__(self, stream, size=8192, line_buffered=False):
+        self.stream = stream
+        self.size = size
+        self.line_buffered = line_buffered
+        self.parts = []
+        self.length = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.length += len(text)
+        if (self.length >= self.size
+            or (self.line_buffered and '\n' in text)):
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts.clear()
+            self.length = 0
+        self.stream.flush()
+
+
+output = OutputBuffer(sys.stdout)
+file_outputs = {}
+# an OutputBuffer for each file written to with show[... ~file << path],
+# which is emptied the first time it is written to
+open_files = []
+# Files opened for writing, so that they are flushed when the program ends
+
+
+def file_output(path):
+    if path not in file_outputs:
+        try:
+            stream = open(path, 'w', encoding='utf-8')
+        except OSError as e:
+            raise FileNotFoundError('cannot write to {!r}: {}'
+                                    .format(path, e.strerror)) from None
+        file_outputs[path] = OutputBuffer(stream, output.size)
+    return file_outputs[path]
+
+
+def flush_output():
+    output.flush()
+    for buffer in file_outputs.values():
+        buffer.flush()
+    for file in open_files:
+        file.writer.flush()
+
+
+@atexit.register
+def close_output():
+    # everything is flushed when the program ends, and the files written
+    # to with show[... ~file << path] or a File are closed
+    flush_output()
+    for buffer in file_outputs.values():
+        buffer.stream.close()
+    file_outputs.clear()
+    for file in list(open_files):
+        file.close()
+
+
 class ShowFunction(Function):
     def __init__(self):
         super(ShowFunction,
@@ -1343,7 +2073,8 @@ class ShowFunction(Function):
                              arbitrary = True,
                              modifiers = {
                                 'end': String(Token(STR, '\n')),
-                                'sep': String(Token(STR, ' '))
+                                'sep': String(Token(STR, ' ')),
+                                'file': none
                              },
                              flags     = ['comma_sep',
                                           'no_newline',
@@ -1359,25 +2090,62 @@ class ShowFunction(Function):
             sep = str(self.parse(self.get_modifier(modifiers, 'sep')))
             # default space char
 
-            result = ''
+            path = self.parse(self.get_modifier(modifiers, 'file'))
+            # default none (stdout)
 
             if self.parse(flags['comma_sep']):
                 sep = ', '
             if self.parse(flags['no_newline']):
                 end = end.rstrip('\n')
 
-            for arg in args[arbitrary][:-1]:
-                result += str(self.parse(arg)) + sep     # add sep char
-
-            arg = args[arbitrary][-1]
-            result += str(self.parse(arg)) + end        # add end char
+            result = sep.join([str(self.parse(arg))
+                               for arg in args[arbitrary]]) + end
 
-            sys.stdout.write(result)
-            if not flags['no_return']:
+            if isinstance(path, NoneObject):
+                output.write(result)
+            elif isinstance(path, File):
+                path.write(result)
+            else:
+                file_output(string_value(path)).write(result)
+            if not self.parse(flags['no_return']):
                 return String(Token(STR, result))
         return none
 
 
+class FlushFunction(Function):
+    def __init__(self):
+        super(FlushFunction,
+              self).__init__(token = Token(IDENTIFIER, 'flush'))
+
+    def __call__(self, args, modifiers, flags):
+        # writes out everything show has buffered so far
+        flush_output()
+        return none
+
+
+class BufferingFunction(Function):
+    def __init__(self):
+        super(BufferingFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'buffering'),
+                             arg_names = ['size'],
+                             flags     = ['line'])
+
+    def __call__(self, args, modifiers, flags):
+        # buffering[size] sets how many characters show holds on to before
+        # writing them out (1 writes straight away), and ~line also writes
+        # out each line to stdout as soon as it is finished
+        size = self.parse(args['size'])
+        if (not isinstance(size, Number) or not size.is_integer()
+            or size.value < 1):
+            raise TypeError('buffer size must be a whole Number >= 1')
+        flush_output()
+        output.size = int(size)
+        output.line_buffered = bool(self.parse(flags['line']))
+        for buffer in file_outputs.values():
+            buffer.size = output.size
+        return none
+
+
 class JoinFunction(Function):
     def __init__(self):
         super(JoinFunction,
@@ -1483,6 +2251,605 @@ class ChainFunction(Function):
         return Chain(iterables)
 
 
+class ArrayFunction(Function):
+    def __init__(self):
+        super(ArrayFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Array'),
+                             arg_names = ['values'])
+
+    def __call__(self, args, modifiers, flags):
+        if numpy is None:
+            raise TypeError('Array requires numpy to be installed')
+        return Array(to_ndarray(self.parse(args['values'])))
+
+
+class TableFunction(Function):
+    def __init__(self):
+        super(TableFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Table'),
+                             arg_names = ['source'],
+                             modifiers = {
+                                 'columns': none
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # Table[Map of column name -> values], Table[iterable of Maps] (e.g.
+        # csv_read[... ~header] or json_load) or Table[iterable of Lists
+        # ~columns << [names...]]
+        if numpy is None:
+            raise TypeError('Table requires numpy to be installed')
+        source = self.parse(args['source'])
+        if isinstance(source, Table):
+            return source
+
+        names = self.parse(self.get_modifier(modifiers, 'columns'))
+        if isinstance(source, Map):
+            return Table({string_value(name): table_column(list(values))
+                          for name, values in source.value.items()})
+
+        if not isinstance(names, NoneObject):
+            names = [string_value(name) for name in names]
+        else:
+            names = None
+        data = keys = None
+        for row in source:
+            if data is None:
+                if names is None:
+                    if not isinstance(row, Map):
+                        raise TypeError('Table rows must be Maps unless '
+                                        '~columns names the columns')
+                    names = [string_value(key) for key in row.value]
+                keys = [String(Token(STR, name)) for name in names]
+                data = [[] for name in names]
+
+            if isinstance(row, Map):
+                values = [row.value.get(key, none) for key in keys]
+            else:
+                values = list(row)
+                if len(values) != len(names):
+                    raise TypeError('Table row {} has {} values, expected {}'
+                                    .format(row, len(values), len(names)))
+            for column, value in zip(data, values):
+                column.append(value)
+
+        if data is None:
+            data = [[] for name in names or []]
+        return Table({name: table_column(column)
+                      for name, column in zip(names or [], data)})
+
+
+class RecordFunction(Function):
+    def __init__(self):
+        super(RecordFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'record'),
+                             arg_names = ['name'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        # Point << record['Point', 'x', 'y'] makes a record type, and
+        # Point[1, 2] makes a Point with the fields x and y
+        name = string_value(self.parse(args['name']))
+        fields = [string_value(self.parse(field))
+                  for field in args[arbitrary]]
+        for field in fields:
+            if (not field or field[0] not in letters_under
+                or any(char not in letters_identifier for char in field)):
+                raise TypeError('invalid record field name {!r}'
+                                .format(field))
+        if len(set(fields)) != len(fields):
+            raise TypeError('record fields must all have different names')
+        return RecordType(name, fields)
+
+
+class RecordType(Function):
+    # a user-declared record type, which is called to make a Record
+
+    def __init__(self, name, fields):
+        super(RecordType, self).__init__(token     = Token(IDENTIFIER, name),
+                                         arg_names = list(fields))
+        self.fields = fields
+        self.slots = ['field_' + field for field in fields]
+        self.positions = dict(zip(fields, self.slots))
+        self.record = type('Record', (Record,), {
+            '__slots__': tuple(self.slots),
+            'record_type': self,
+            })
+        # a class for each record type, with a slot for each field
+
+    def __str__(self):
+        return '<record type {}>'.format(self.value)
+
+    def __call__(self, args, modifiers, flags):
+        return self.make([self.parse(args[field]) for field in self.fields])
+
+    def make(self, values):
+        return self.record(values)
+
+
+class MapFunction(Function):
+    def __init__(self):
+        super(MapFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Map'),
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        items = {}
+        for pair in args[arbitrary]:
+            pair = self.parse(pair)
+            try:
+                key, value = pair
+            except (TypeError, ValueError):
+                raise TypeError('Map items must be [key, value] pairs, got {}'
+                                .format(pair)) from None
+            items[map_key(key)] = value
+        return Map(items)
+
+
+class SetFunction(Function):
+    def __init__(self):
+        super(SetFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Set'),
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        # Set[] is empty, Set[iterable, ...] has the items of each iterable
+        return Set(set_values(self.parse(i) for i in args[arbitrary]))
+
+
+class RegexFunction(Function):
+    def __init__(self):
+        super(RegexFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Regex'),
+                             arg_names = ['pattern'],
+                             flags     = ['ignore_case', 'multiline',
+                                          'dotall'])
+
+    def __call__(self, args, modifiers, flags):
+        options = 0
+        if self.parse(flags['ignore_case']):
+            options |= re.IGNORECASE
+        if self.parse(flags['multiline']):
+            options |= re.MULTILINE
+        if self.parse(flags['dotall']):
+            options |= re.DOTALL
+        pattern = string_value(self.parse(args['pattern']))
+        return Regex(compile_pattern(pattern, options))
+
+
+class FileFunction(Function):
+    def __init__(self):
+        super(FileFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'File'),
+                             arg_names = ['path'],
+                             flags     = ['write', 'append'])
+
+    def __call__(self, args, modifiers, flags):
+        # File[path] is read from, File[path ~write] empties the file and
+        # writes to it and File[path ~append] writes to the end of it
+        if self.parse(flags['write']):
+            mode = 'w'
+        elif self.parse(flags['append']):
+            mode = 'a'
+        else:
+            mode = 'r'
+        return File(string_value(self.parse(args['path'])), mode)
+
+
+class BytesFunction(Function):
+    def __init__(self):
+        super(BytesFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Bytes'),
+                             arg_names = ['source'],
+                             modifiers = {
+                                 'encoding': String(Token(STR, 'utf-8'))
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # Bytes[String ~encoding] encodes a String, and Bytes[iterable]
+        # takes Numbers from 0 to 255
+        source = self.parse(args['source'])
+        if isinstance(source, Bytes):
+            return source
+        if isinstance(source, String):
+            encoding = string_value(self.parse(self.get_modifier(modifiers,
+                                                                 'encoding')))
+            try:
+                data = source.value.encode(encoding)
+            except (LookupError, UnicodeError) as e:
+                raise TypeError('cannot encode String: {}'.format(e)) from None
+        else:
+            data = bytes(byte_value(item) for item in source)
+        return Bytes(memoryview(data))
+
+
+class MmapFunction(Function):
+    def __init__(self):
+        super(MmapFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'mmap'),
+                             arg_names = ['path'],
+                             flags     = ['write'])
+
+    def __call__(self, args, modifiers, flags):
+        # the file's contents as Bytes, read from disk as they are used -
+        # with ~write, setting a byte changes the file
+        path = string_value(self.parse(args['path']))
+        write = bool(self.parse(flags['write']))
+        try:
+            with open(path, 'r+b' if write else 'rb') as file:
+                source = mmap.mmap(file.fileno(), 0,
+                                   access=(mmap.ACCESS_WRITE if write
+                                           else mmap.ACCESS_READ))
+        except ValueError:
+            return Bytes(memoryview(b''))   # empty files can't be mapped
+        except OSError as e:
+            raise FileNotFoundError('cannot map {!r}: {}'
+                                    .format(path, e.strerror)) from None
+        return Bytes(memoryview(source), source)
+
+
+class CsvReadFunction(Function):
+    def __init__(self):
+        super(CsvReadFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'csv_read'),
+                             arg_names = ['source'],
+                             modifiers = {
+                                 'types': none,
+                                 'sep': String(Token(STR, ',')),
+                                 'record': none
+                                 },
+                             flags     = ['header'])
+
+    def __call__(self, args, modifiers, flags):
+        # csv_read[path or File] reads a row at a time as it is iterated
+        # over - ~types is a type name ('number', 'string' or 'boolean')
+        # for every column or a List of one per column, and with ~header
+        # the first row names the columns and each row is a Map (or with
+        # ~record << T, each row is made into a T)
+        source = self.parse(args['source'])
+        if not isinstance(source, File):
+            source = string_value(source)
+        types = self.parse(self.get_modifier(modifiers, 'types'))
+        sep = string_value(self.parse(self.get_modifier(modifiers, 'sep')))
+        if len(sep) != 1:
+            raise TypeError('~sep must be a single character')
+        record = self.parse(self.get_modifier(modifiers, 'record'))
+        if isinstance(record, NoneObject):
+            record = None
+        elif not isinstance(record, RecordType):
+            raise TypeError('~record must be a record type, got {}'
+                            .format(record))
+        return Rows(source, types, sep, bool(self.parse(flags['header'])),
+                    record)
+
+
+class CsvWriteFunction(Function):
+    def __init__(self):
+        super(CsvWriteFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'csv_write'),
+                             arg_names = ['file', 'rows'],
+                             modifiers = {
+                                 'sep': String(Token(STR, ','))
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # writes each row (an iterable) of 'rows' as a line of 'file', a
+        # File opened for writing, through its buffer
+        file = self.parse(args['file'])
+        if not isinstance(file, File):
+            raise TypeError('expected File type, got {}'
+                            .format(type(file).__name__))
+        sep = string_value(self.parse(self.get_modifier(modifiers, 'sep')))
+        if len(sep) != 1:
+            raise TypeError('~sep must be a single character')
+        file.write('')      # checks that the File can be written to
+        writer = csv.writer(file.writer, delimiter=sep, lineterminator='\n')
+        writer.writerows(['' if isinstance(item, NoneObject) else str(item)
+                          for item in row]
+                         for row in self.parse(args['rows']))
+        return none
+
+
+class JsonLoadFunction(Function):
+    def __init__(self):
+        super(JsonLoadFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'json_load'),
+                             arg_names = ['source'])
+
+    def __call__(self, args, modifiers, flags):
+        # json_load[text] or json_load[File] - objects become Maps and
+        # numbers are read straight into Numbers
+        source = self.parse(args['source'])
+        if isinstance(source, File):
+            text = source.read()
+        else:
+            text = string_value(source)
+        try:
+            value = json.loads(text,
+                               parse_int=decimal.Decimal,
+                               parse_float=decimal.Decimal,
+                               parse_constant=json_constant)
+        except json.JSONDecodeError as e:
+            raise SyntaxError('invalid JSON: {}'.format(e)) from None
+        return from_json(value)
+
+
+class JsonDumpFunction(Function):
+    def __init__(self):
+        super(JsonDumpFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'json_dump'),
+                             arg_names = ['value'],
+                             modifiers = {
+                                 'indent': none,
+                                 'file': none
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # the JSON for 'value' as a String, or written to the File given
+        # as ~file - ~indent puts each item on its own line
+        indent = self.parse(self.get_modifier(modifiers, 'indent'))
+        if isinstance(indent, NoneObject):
+            indent = None
+        elif (isinstance(indent, Number) and indent.is_integer()
+              and indent.value >= 0):
+            indent = int(indent)
+        else:
+            raise TypeError('~indent must be a whole Number >= 0')
+
+        parts = []
+        to_json(self.parse(args['value']), parts, indent, 0)
+        text = ''.join(parts)
+
+        file = self.parse(self.get_modifier(modifiers, 'file'))
+        if isinstance(file, NoneObject):
+            return String(Token(STR, text))
+        if not isinstance(file, File):
+            raise TypeError('expected File type, got {}'
+                            .format(type(file).__name__))
+        file.write(text)
+        return none
+
+
+class DatabaseFunction(Function):
+    def __init__(self):
+        super(DatabaseFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Database'),
+                             arg_names = ['path'])
+
+    def __call__(self, args, modifiers, flags):
+        # Database[path] (or Database[':memory:']) - the same connection is
+        # used each time a path is opened
+        return Database(string_value(self.parse(args['path'])))
+
+
+class DequeFunction(Function):
+    def __init__(self):
+        super(DequeFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Deque'),
+                             arbitrary = True,
+                             modifiers = {
+                                 'limit': none
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # Deque[] is empty, Deque[iterable, ...] has the items of each
+        # iterable - with ~limit, adding to a full Deque drops an item from
+        # the other end
+        limit = self.parse(self.get_modifier(modifiers, 'limit'))
+        if isinstance(limit, NoneObject):
+            limit = None
+        elif (isinstance(limit, Number) and limit.is_integer()
+              and limit.value >= 0):
+            limit = int(limit)
+        else:
+            raise TypeError('~limit must be a whole Number >= 0')
+        items = itertools.chain.from_iterable(self.parse(iterable)
+                                              for iterable in args[arbitrary])
+        return Deque(collections.deque(items, limit))
+
+
+class HeapFunction(Function):
+    def __init__(self):
+        super(HeapFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Heap'),
+                             arbitrary = True,
+                             modifiers = {
+                                 'key': none
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        # Heap[iterable, ...] - pop always gives the smallest item (or the
+        # item with the smallest ~key), and equal items come out in the
+        # order they were pushed
+        key = self.parse(self.get_modifier(modifiers, 'key'))
+        heap = Heap(None if isinstance(key, NoneObject)
+                    else prepare_call(key, 1))
+        for iterable in args[arbitrary]:
+            for item in self.parse(iterable):
+                heap.value.append(heap.entry(item))
+        heapq.heapify(heap.value)
+        return heap
+
+
+class RangeFunction(Function):
+    def __init__(self):
+        super(RangeFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'Range'),
+                             arg_names = ['start', 'stop'],
+                             modifiers = {
+                                 'step': Number(Token(NUM,
+                                                decimal.Decimal(1)))
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        bounds = [self.parse(args['start']),
+                  self.parse(args['stop']),
+                  self.parse(self.get_modifier(modifiers, 'step'))]
+        for bound in bounds:
+            if not isinstance(bound, Number):
+                raise TypeError('Range bounds must be Numbers, got {}'
+                                .format(bound.__class__.__name__))
+        return Range(*[bound.value for bound in bounds])
+
+
+class MappedFunction(Function):
+    def __init__(self):
+        super(MappedFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'map'),
+                             arg_names = ['function', 'iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        # map[f, a, b] calls f with an item of each iterable at a time,
+        # stopping at the end of the shortest
+        iterables = [self.parse(args['iterable']),
+                     *[self.parse(i) for i in args[arbitrary]]]
+        return Mapped(self.parse(args['function']), iterables)
+
+
+class FilteredFunction(Function):
+    def __init__(self):
+        super(FilteredFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'filter'),
+                             arg_names = ['function', 'iterable'])
+
+    def __call__(self, args, modifiers, flags):
+        return Filtered(self.parse(args['function']),
+                        self.parse(args['iterable']))
+
+
+class ReduceFunction(Function):
+    def __init__(self):
+        super(ReduceFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'reduce'),
+                             arg_names = ['function', 'iterable'],
+                             modifiers = {
+                                 'initial': none
+                                 })
+
+    def __call__(self, args, modifiers, flags):
+        call = prepare_call(self.parse(args['function']), 2)
+        iterator = iter(self.parse(args['iterable']))
+        if 'initial' in modifiers:
+            # checked by name since none is a valid initial value
+            result = self.parse(modifiers['initial'])
+        else:
+            try:
+                result = next(iterator)
+            except StopIteration:
+                raise TypeError('cannot reduce an empty iterable without an '
+                                'initial value') from None
+
+        for item in iterator:
+            result = call(result, item)
+        return result
+
+
+class SumFunction(Function):
+    def __init__(self):
+        super(SumFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'sum'),
+                             arg_names = ['iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        iterable = aggregate_source(self, args)
+        if isinstance(iterable, Range):
+            # start*n + step*(0 + 1 + ... + n-1)
+            n = iterable.length
+            total = iterable.start * n + iterable.step * (n * (n - 1) // 2)
+        else:
+            total = sum(number_values(self, iterable), decimal.Decimal(0))
+        return Number(Token(NUM, total))
+
+
+class MeanFunction(Function):
+    def __init__(self):
+        super(MeanFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'mean'),
+                             arg_names = ['iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        iterable = aggregate_source(self, args)
+        if isinstance(iterable, Range) and iterable.length:
+            # evenly spaced, so halfway between the first and last
+            return Number(Token(NUM, (iterable.item(0).value
+                                      + iterable.item(-1).value) / 2))
+        values = number_values(self, iterable)
+        if not values:
+            raise TypeError('mean of an empty iterable')
+        return Number(Token(NUM, sum(values, decimal.Decimal(0))
+                                 / len(values)))
+
+
+class MinFunction(Function):
+    def __init__(self):
+        super(MinFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'min'),
+                             arg_names = ['iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        iterable = aggregate_source(self, args)
+        if isinstance(iterable, Range) and iterable.length:
+            return min(iterable.item(0), iterable.item(-1))
+        values = number_values(self, iterable)
+        if not values:
+            raise TypeError('min of an empty iterable')
+        return Number(Token(NUM, min(values)))
+
+
+class MaxFunction(Function):
+    def __init__(self):
+        super(MaxFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'max'),
+                             arg_names = ['iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        iterable = aggregate_source(self, args)
+        if isinstance(iterable, Range) and iterable.length:
+            return max(iterable.item(0), iterable.item(-1))
+        values = number_values(self, iterable)
+        if not values:
+            raise TypeError('max of an empty iterable')
+        return Number(Token(NUM, max(values)))
+
+
+class CountFunction(Function):
+    def __init__(self):
+        super(CountFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'count'),
+                             arg_names = ['iterable'],
+                             arbitrary = True)
+
+    def __call__(self, args, modifiers, flags):
+        iterable = aggregate_source(self, args)
+        if isinstance(iterable, (List, Range, Set, Map, String, Table)):
+            n = len(iterable)
+        else:
+            n = sum(1 for _ in iterable)
+        return Number(Token(NUM, decimal.Decimal(n)))
+
+
+class SortFunction(Function):
+    def __init__(self):
+        super(SortFunction,
+              self).__init__(token     = Token(IDENTIFIER, 'sort'),
+                             arg_names = ['iterable'],
+                             modifiers = {
+                                 'key': none
+                                 },
+                             flags     = ['reverse'])
+
+    def __call__(self, args, modifiers, flags):
+        key = self.parse(self.get_modifier(modifiers, 'key'))
+        return List(Token(LIST,
+                          sorted_values(list(self.parse(args['iterable'])),
+                                        key,
+                                        self.parse(flags['reverse']))))
+
+
 class StringFunction(Function):
     def __init__(self):
         super(StringFunction,
@@ -1500,28 +2867,21 @@ class NumberFunction(Function):
                              arg_names = ['value'])
 
     def __call__(self, args, modifiers, flags):
-        result = ''   # similar to lexer here to check for a num format
         string = self.parse(args['value'])
         if isinstance(string, Number):
             return Number(Token(NUM, decimal.Decimal(float(string))))
-        string = str(string).strip('\n ')
-        length = len(string)
-        pos = 0
-        while pos < length and string[pos] in digits:
-            result += string[pos]
-            pos += 1
-        if pos < length and string[pos] == '.':
-            result += string[pos]
-            pos +=1
+        return number_from_string(str(string))
 
-        while pos < length and string[pos] in digits:
-            result += string[pos]
-            pos += 1
 
-        if pos < len(string):
-            raise TypeError('invalid value to convert to Number')
+number_format = re.compile(r'[+-]?(\d+\.?\d*|\.\d+)')
+# the same format as Number literals, with an optional sign
 
-        return Number(Token(NUM, decimal.Decimal(result)))
+
+def number_from_string(string):
+    string = string.strip('\n ')
+    if not number_format.fullmatch(string):
+        raise TypeError('invalid value to convert to Number')
+    return Number(Token(NUM, decimal.Decimal(string)))
 
 
 class ListFunction(Function):
@@ -1579,6 +2939,8 @@ class BooleanFunction(Function):
 class List(Type):
 
     function = ListFunction()
+    frozen = False
+    # set by set_key on the copies of Lists kept in a Set
 
     def __init__(self, token):
         msg = 'expected python <list> type, got <{}>'
@@ -1586,10 +2948,94 @@ class List(Type):
         Type.__init__(self, token,
                             error_msg=msg,
                             expected_type=list)
-        self.__namespace__ = {
-            'add': BoundMethod(self, add),
-            'remove': BoundMethod(self, remove)
-            }
+        self.__namespace__ = Namespace(self, List)
+
+    # A List's items are the items of 'buffer' at the positions in
+    # 'indices' (or the whole buffer if 'indices' is None), so slices and
+    # copies can share their parent's buffer instead of copying it. Any
+    # List whose buffer may be used by another List is marked as 'shared'
+    # and copies its items before changing them. A shared buffer is never
+    # used as a whole, so items can be added to the end of it without any
+    # of the Lists sharing it seeing them.
+
+    @property
+    def value(self):
+        if self.indices is None:
+            return self.buffer
+        return self.copy_values()
+
+    @value.setter
+    def value(self, values):
+        self.buffer = values
+        self.indices = None
+        self.shared = False
+
+    def positions(self):
+        if self.indices is None:
+            return range(len(self.buffer))
+        return self.indices
+
+    def copy_values(self):
+        if self.indices is None:
+            return self.buffer[:]
+        start, stop, step = (self.indices.start,
+                             self.indices.stop,
+                             self.indices.step)
+        if step == 1:
+            return self.buffer[start:stop]
+        return [self.buffer[i] for i in self.indices]
+
+    def detach(self):
+        # returns the python list to change in place, copying it first if
+        # it is shared with any other List
+        if self.frozen:
+            raise TypeError('a List in a Set cannot be changed')
+        if self.shared or self.indices is not None:
+            self.value = self.copy_values()
+        return self.buffer
+
+    def item(self, index):
+        try:
+            return self.buffer[self.positions()[index]]
+        except IndexError:
+            raise TypeError('List index out of range') from None
+
+    def slice(self, start=None, stop=None, step=None):
+        self.indices = self.positions()
+        view = List(Token(LIST, self.buffer))
+        view.indices = self.indices[start:stop:step]
+        view.shared = self.shared = True
+        return view
+
+    def appended(self, value):
+        # a new List with 'value' on the end, which shares this List's
+        # buffer unless another List has already added to the end of it
+        positions = self.positions()
+        if positions.step != 1 or positions.stop != len(self.buffer):
+            return List(Token(LIST, self.copy_values() + [value]))
+
+        self.indices = positions
+        self.buffer.append(value)
+        copy = List(Token(LIST, self.buffer))
+        copy.indices = range(positions.start, positions.stop + 1)
+        copy.shared = self.shared = True
+        return copy
+
+    def removed(self, index):
+        # a new List without the item at 'index' - removing the first or
+        # last item shares this List's buffer, anything else copies it
+        length = len(self.positions())
+        if not -length <= index < length:
+            raise TypeError('List index out of range')
+        index %= length
+        if index == 0:
+            return self.slice(1, None)
+        elif index == length - 1:
+            return self.slice(None, -1)
+
+        values = self.copy_values()
+        del values[index]
+        return List(Token(LIST, values))
 
 
 @objMethod(List, arg_names=['value'], flags=['copy'])
@@ -1598,11 +3044,9 @@ def add(self, args, modifiers, flags):
         raise TypeError('expected List type, got {}'
                         .format(type(args[instance]).__name__))
     if flags['copy']:
-        values = args[instance].value
-        values.append(args['value'])
-        return List(Token(LIST, values))
+        return args[instance].appended(args['value'])
     else:
-        args[instance].value.append(args['value'])
+        args[instance].detach().append(args['value'])
         return none
 
 
@@ -1618,17 +3062,32 @@ def remove(self, args, modifiers, flags):
         raise TypeError('expected List type, got {}'
                         .format(type(obj).__name__))
     if flags['copy']:
-        values = obj.value
-        values.pop(int(index))
-        return List(Token(LIST, values))
+        return obj.removed(int(index))
     else:
-        args[instance].value.pop(int(index))
+        try:
+            args[instance].detach().pop(int(index))
+        except IndexError:
+            raise TypeError('List index out of range') from None
         return none
 
 
+@objMethod(List, name='sort', modifiers={'key': none}, flags=['reverse'])
+def list_sort(self, args, modifiers, flags):
+    obj = args[instance]
+    if not isinstance(obj, List):
+        raise TypeError('expected List type, got {}'
+                        .format(type(obj).__name__))
+    key = self.parse(self.get_modifier(modifiers, 'key'))
+    values = sorted_values(obj.value, key, self.parse(flags['reverse']))
+    buffer = obj.detach()
+    buffer[:] = values
+    return none
+
+
 List.__namespace__ = {
     'add': add,
     'remove': remove,
+    'sort': list_sort,
     }
 
 
@@ -1641,11 +3100,9 @@ class Number(Type):
         Type.__init__(self, token,
                             error_msg=msg,
                             expected_type=decimal.Decimal)
-        for name, func in self.__class__.__namespace__.items():
-            try:
-                self.__namespace__[name] = BoundMethod(self, func)
-            except NameError:
-                continue
+        self.__namespace__ = Namespace(self, self.__class__)
+        # each Number has its own namespace so that its methods are bound
+        # to it rather than to the last Number created
 
     def __int__(self):
         return int(self.value)
@@ -1700,16 +3157,9 @@ class String(Type):
                             error_msg=msg,
                             expected_type=str)
 
-        namespace = {}
-        for name, func in self.__class__.__namespace__.items():
-            try:
-                self.__namespace__[name] = BoundMethod(self, func)
-                namespace[name] = BoundMethod(self, func)
-            except (NameError, AttributeError):
-                continue
-                # dont add if the name hasn't been defined yet:
-                # this may occur in method definitions
-        self.__namespace__['__namespace__'] = namespace
+        self.__namespace__ = Namespace(self, self.__class__)
+        # each String has its own namespace so that its methods are bound
+        # to it rather than to the last String created
 
 
 @objMethod(String, flags=['in_place'])
@@ -1753,10 +3203,127 @@ def join(self, args, modifiers, flags):
     return JoinFunction()(args, modifiers, flags)
     # don't pass self in here as the JoinFunction instance takes its place
 
+
+def string_value(obj):
+    if not isinstance(obj, String):
+        raise TypeError('expected String type, got {}'
+                        .format(type(obj).__name__))
+    return obj.value
+
+
+def string_limit(limit):
+    # the python 'count'/'maxsplit' for a ~limit modifier (-1 is no limit)
+    if isinstance(limit, NoneObject):
+        return -1
+    if (not isinstance(limit, Number)
+        or not limit.is_integer()
+        or limit.value < 0):
+        raise TypeError('~limit must be a whole Number >= 0')
+    return int(limit)
+
+
+def string_bound(bound):
+    # the python index for a ~start/~end modifier (None is open)
+    if isinstance(bound, NoneObject):
+        return None
+    if not isinstance(bound, Number) or not bound.is_integer():
+        raise TypeError('expected a whole Number, got {}'.format(bound))
+    return int(bound)
+
+
+@objMethod(String, name='split', modifiers={'sep': none, 'limit': none})
+def string_split(self, args, modifiers, flags):
+    value = string_value(args[instance])
+    sep = self.parse(self.get_modifier(modifiers, 'sep'))
+    sep = None if isinstance(sep, NoneObject) else string_value(sep)
+    if sep == '':
+        raise TypeError('~sep cannot be an empty String')
+    limit = string_limit(self.parse(self.get_modifier(modifiers, 'limit')))
+    return List(Token(LIST, [String(Token(STR, part))
+                             for part in value.split(sep, limit)]))
+
+
+@objMethod(String, name='replace', arg_names=['old', 'new'],
+           modifiers={'limit': none})
+def string_replace(self, args, modifiers, flags):
+    value = string_value(args[instance])
+    limit = string_limit(self.parse(self.get_modifier(modifiers, 'limit')))
+    return String(Token(STR, value.replace(string_value(args['old']),
+                                           string_value(args['new']),
+                                           limit)))
+
+
+@objMethod(String, name='find', arg_names=['substring'],
+           modifiers={'start': none, 'end': none})
+def string_find(self, args, modifiers, flags):
+    # the position of the first 'substring', or -1 if there isn't one
+    value = string_value(args[instance])
+    start = string_bound(self.parse(self.get_modifier(modifiers, 'start')))
+    end = string_bound(self.parse(self.get_modifier(modifiers, 'end')))
+    position = value.find(string_value(args['substring']), start, end)
+    return Number(Token(NUM, decimal.Decimal(position)))
+
+
+@objMethod(String, name='index', arg_names=['substring'],
+           modifiers={'start': none, 'end': none})
+def string_index(self, args, modifiers, flags):
+    # like find, but it's an error if there isn't a 'substring'
+    value = string_value(args[instance])
+    substring = string_value(args['substring'])
+    start = string_bound(self.parse(self.get_modifier(modifiers, 'start')))
+    end = string_bound(self.parse(self.get_modifier(modifiers, 'end')))
+    position = value.find(substring, start, end)
+    if position == -1:
+        raise TypeError('{!r} is not in the String'.format(substring))
+    return Number(Token(NUM, decimal.Decimal(position)))
+
+
+@objMethod(String, name='count', arg_names=['substring'])
+def string_count(self, args, modifiers, flags):
+    value = string_value(args[instance])
+    count = value.count(string_value(args['substring']))
+    return Number(Token(NUM, decimal.Decimal(count)))
+
+
+def strip_method(name):
+    # strip, lstrip and rstrip only differ in which str method they use
+
+    @objMethod(String, name=name, modifiers={'chars': none})
+    def string_strip(self, args, modifiers, flags):
+        value = string_value(args[instance])
+        chars = self.parse(self.get_modifier(modifiers, 'chars'))
+        chars = None if isinstance(chars, NoneObject) else string_value(chars)
+        return String(Token(STR, getattr(value, name)(chars)))
+
+    return string_strip
+
+
+@objMethod(String, name='startswith', arg_names=['prefix'])
+def string_startswith(self, args, modifiers, flags):
+    value = string_value(args[instance])
+    return true if value.startswith(string_value(args['prefix'])) else false
+
+
+@objMethod(String, name='endswith', arg_names=['suffix'])
+def string_endswith(self, args, modifiers, flags):
+    value = string_value(args[instance])
+    return true if value.endswith(string_value(args['suffix'])) else false
+
+
 String.__namespace__ = {
     'uppercase': uppercase,
     'lowercase': lowercase,
-    'join': join
+    'join': join,
+    'split': string_split,
+    'replace': string_replace,
+    'find': string_find,
+    'index': string_index,
+    'count': string_count,
+    'strip': strip_method('strip'),
+    'lstrip': strip_method('lstrip'),
+    'rstrip': strip_method('rstrip'),
+    'startswith': string_startswith,
+    'endswith': string_endswith,
     }
 
 
@@ -1798,7 +3365,7 @@ class Parallel(Type):
     def __init__(self, iterables,
                  short=False,
                  pad=None):
-        Type.__init__(self, List(Token(LIST, iterables)))
+        Type.__init__(self, Token(LIST, iterables))
         self.iterables = iterables
         self.short = bool(short)
         self.pad = pad if pad is not None else none
@@ -1809,8 +3376,1585 @@ class Chain(Type):
     function = ChainFunction()
 
     def __init__(self, iterables):
-        Type.__init__(self, List(Token(LIST, iterables)))
+        Type.__init__(self, Token(LIST, iterables))
+        self.iterables = iterables
+
+
+class Array(Type):
+
+    function = ArrayFunction()
+
+    def __init__(self, value):
+        msg = 'expected python <numpy.ndarray> type, got <{}>'
+        Type.__init__(self, Token(ARRAY, value),
+                            error_msg=msg,
+                            expected_type=numpy.ndarray)
+        self.__namespace__ = Namespace(self, Array)
+
+
+def from_python_number(value):
+    # integral floats are stored without a fractional part so that they
+    # display the same way as Number literals do
+    value = float(value)
+    if value.is_integer():
+        return Number(Token(NUM, decimal.Decimal(int(value))))
+    return Number(Token(NUM, decimal.Decimal(repr(value))))
+
+
+def from_ndarray(value):
+    if value.ndim == 0:
+        return from_python_number(value)
+    return List(Token(LIST, [from_ndarray(row) if value.ndim > 1
+                             else from_python_number(row)
+                             for row in value]))
+
+
+def to_ndarray(obj):
+    if isinstance(obj, Array):
+        return obj.value
+
+    def convert(obj):
+        if isinstance(obj, Number):
+            return float(obj.value)
+        elif isinstance(obj, Array):
+            return obj.value.tolist()
+        elif isinstance(obj, (String, NoneObject)):
+            raise TypeError('Array values must be Numbers, got {}'
+                            .format(obj.__class__.__name__))
+        return [convert(item) for item in obj]
+
+    try:
+        return numpy.array(convert(obj), dtype=float)
+    except ValueError:
+        raise TypeError('Array rows must all be the same length') from None
+
+
+def array_operation(op, obj_1, obj_2):
+    operands = []
+    for obj in (obj_1, obj_2):
+        if isinstance(obj, Array):
+            operands.append(obj.value)
+        elif isinstance(obj, Number):
+            operands.append(float(obj.value))
+        else:
+            return NotImplemented
+
+    if (op in (operator.truediv, operator.floordiv, operator.mod)
+        and not numpy.all(operands[1])):
+        raise ZeroDivisionError('attempted division by zero')
+    try:
+        return Array(op(*operands))
+    except ValueError:
+        raise TypeError('Array shapes {} and {} are incompatible'
+                        .format(numpy.shape(operands[0]),
+                                numpy.shape(operands[1]))) from None
+
+
+def array_reduction(method, reduction, args, modifiers):
+    obj = args[instance]
+    if not isinstance(obj, Array):
+        raise TypeError('expected Array type, got {}'
+                        .format(type(obj).__name__))
+    axis = method.parse(method.get_modifier(modifiers, 'axis'))
+    if isinstance(axis, NoneObject):
+        if not obj.value.size:
+            raise TypeError('cannot reduce an empty Array')
+        return from_python_number(reduction(obj.value))
+    if not isinstance(axis, Number) or not axis.is_integer():
+        raise TypeError('Array axis must be an integer Number')
+    try:
+        result = reduction(obj.value, axis=int(axis))
+    except ValueError as e:  # includes numpy's AxisError
+        raise TypeError(str(e)) from None
+    return Array(result)
+
+
+@objMethod(Array, name='sum', modifiers={'axis': none})
+def array_sum(self, args, modifiers, flags):
+    return array_reduction(self, numpy.sum, args, modifiers)
+
+
+@objMethod(Array, name='mean', modifiers={'axis': none})
+def array_mean(self, args, modifiers, flags):
+    return array_reduction(self, numpy.mean, args, modifiers)
+
+
+@objMethod(Array, name='min', modifiers={'axis': none})
+def array_min(self, args, modifiers, flags):
+    return array_reduction(self, numpy.min, args, modifiers)
+
+
+@objMethod(Array, name='max', modifiers={'axis': none})
+def array_max(self, args, modifiers, flags):
+    return array_reduction(self, numpy.max, args, modifiers)
+
+
+@objMethod(Array, arg_names=['other'])
+def matmul(self, args, modifiers, flags):
+    obj = args[instance]
+    other = args['other']
+    if not isinstance(other, Array):
+        other = Array(to_ndarray(other))
+    try:
+        result = numpy.matmul(obj.value, other.value)
+    except ValueError:
+        raise TypeError('cannot matrix multiply Arrays of shapes {} and {}'
+                        .format(obj.value.shape, other.value.shape)) from None
+    if numpy.ndim(result) == 0:
+        return from_python_number(result)
+    return Array(result)
+
+
+@objMethod(Array)
+def transpose(self, args, modifiers, flags):
+    return Array(args[instance].value.T)
+
+
+@objMethod(Array)
+def shape(self, args, modifiers, flags):
+    return List(Token(LIST, [from_python_number(n)
+                             for n in args[instance].value.shape]))
+
+
+@objMethod(Array, name='list')
+def array_list(self, args, modifiers, flags):
+    return from_ndarray(args[instance].value)
+
+
+Array.__namespace__ = {
+    'sum': array_sum,
+    'mean': array_mean,
+    'min': array_min,
+    'max': array_max,
+    'matmul': matmul,
+    'transpose': transpose,
+    'shape': shape,
+    'list': array_list,
+    }
+
+
+class Table(Type):
+
+    function = TableFunction()
+
+    def __init__(self, columns):
+        # 'columns' maps each column's name to a (kind, numpy array) pair
+        Type.__init__(self, Token(TABLE, {name: column
+                                          for name, (kind, column)
+                                          in columns.items()}))
+        self.kinds = {name: kind for name, (kind, column) in columns.items()}
+        lengths = {len(column) for column in self.value.values()}
+        if len(lengths) > 1:
+            raise TypeError('Table columns must all be the same length')
+        self.length = lengths.pop() if lengths else 0
+        self.__namespace__ = Namespace(self, Table)
+
+    def column(self, name):
+        name = string_value(name)
+        if name not in self.value:
+            raise TypeError('Table has no column {!r}'.format(name))
+        return name, self.kinds[name], self.value[name]
+
+    def take(self, selection):
+        # a Table of the rows picked out by a mask or an array of positions
+        return Table({name: (self.kinds[name], column[selection])
+                      for name, column in self.value.items()})
+
+
+def table_column(values):
+    # the kind and numpy array for a column of Leaf values - Numbers are
+    # floats (none is nan), Booleans are bools and Strings are python strs
+    # (so a Number column only keeps about 16 significant digits of each
+    # Number, and works on it with float arithmetic - see demos/table.leaf)
+    if all(isinstance(value, (Number, NoneObject))
+           and not isinstance(value, Boolean) for value in values):
+        return 'number', numpy.array([numpy.nan if value is none
+                                      else float(value.value)
+                                      for value in values], dtype=float)
+    elif all(isinstance(value, Boolean) for value in values):
+        return 'boolean', numpy.array([bool(value.value) for value in values],
+                                      dtype=bool)
+
+    column = numpy.empty(len(values), dtype=object)
+    if all(isinstance(value, String) for value in values):
+        column[:] = [value.value for value in values]
+        return 'string', column
+    for i, value in enumerate(values):
+        column[i] = value     # one at a time so Lists aren't unpacked
+    return 'object', column
+
+
+def table_values(kind, column):
+    # the Leaf values of a column, converted all at once
+    if kind == 'number':
+        return [none if value != value else from_python_number(value)
+                for value in column.tolist()]   # nan != nan
+    elif kind == 'boolean':
+        return [true if value else false for value in column.tolist()]
+    elif kind == 'string':
+        return [String(Token(STR, value)) for value in column.tolist()]
+    return list(column)
+
+
+table_comparisons = {
+    '=': operator.eq,
+    '!': operator.ne,
+    '<': operator.lt,
+    '>': operator.gt,
+    '<=': operator.le,
+    '>=': operator.ge,
+    }
+
+
+def table_names(obj):
+    # column names given as a String or an iterable of Strings
+    if isinstance(obj, String):
+        return [obj.value]
+    return [string_value(name) for name in obj]
+
+
+@objMethod(Table, name='columns')
+def table_columns(self, args, modifiers, flags):
+    return List(Token(LIST, [String(Token(STR, name))
+                             for name in args[instance].value]))
+
+
+@objMethod(Table, name='column', arg_names=['name'])
+def table_get_column(self, args, modifiers, flags):
+    # a number column is an Array, any other column is a List - so is a
+    # number column with missing values, which are none rather than nan
+    name, kind, column = args[instance].column(args['name'])
+    if kind == 'number' and not numpy.isnan(column).any():
+        return Array(column.copy())
+    return List(Token(LIST, table_values(kind, column)))
+
+
+@objMethod(Table, name='select', arbitrary=True)
+def table_select(self, args, modifiers, flags):
+    # a Table of just the named columns (which aren't copied)
+    table = args[instance]
+    columns = {}
+    for name in args[arbitrary]:
+        name, kind, column = table.column(self.parse(name))
+        columns[name] = kind, column
+    return Table(columns)
+
+
+@objMethod(Table, name='where', arg_names=['column', 'comparison', 'value'])
+def table_where(self, args, modifiers, flags):
+    # t.where['age', '>=', 18] - the rows where the comparison is true,
+    # worked out for the whole column at once
+    table = args[instance]
+    name, kind, column = table.column(args['column'])
+    comparison = table_comparisons.get(string_value(args['comparison']))
+    if comparison is None:
+        raise TypeError('Table comparisons are {}, got {}'
+                        .format(', '.join(table_comparisons),
+                                args['comparison']))
+    value = args['value']
+    if kind == 'number' and isinstance(value, Number):
+        value = float(value.value)
+    elif kind == 'boolean' and isinstance(value, Boolean):
+        value = bool(value.value)
+    elif kind == 'string' and isinstance(value, String):
+        value = value.value
+    else:
+        raise TypeError('cannot compare the {} column {!r} with {}'
+                        .format(kind, name, value.__class__.__name__))
+    with numpy.errstate(invalid='ignore'):
+        mask = numpy.asarray(comparison(column, value), dtype=bool)
+    if kind == 'number':
+        mask &= ~numpy.isnan(column)   # none never matches, even for '!'
+    return table.take(mask)
+
+
+@objMethod(Table, name='sort', arg_names=['column'], flags=['reverse'])
+def table_sort(self, args, modifiers, flags):
+    # a Table sorted by a column, keeping equal rows in the same order
+    table = args[instance]
+    name, kind, column = table.column(args['column'])
+    if kind == 'object':
+        raise TypeError('cannot sort by the mixed column {!r}'.format(name))
+    if self.parse(flags['reverse']) and kind == 'number':
+        order = numpy.argsort(-column, kind='stable')   # none stays last
+    elif self.parse(flags['reverse']) and kind == 'boolean':
+        order = numpy.argsort(~column, kind='stable')
+    elif self.parse(flags['reverse']):
+        # a stable sort of the reversed column, reversed again, keeps equal
+        # rows in their original order
+        order = numpy.argsort(column[::-1], kind='stable')[::-1]
+        order = len(column) - 1 - order
+    else:
+        order = numpy.argsort(column, kind='stable')
+    return table.take(order)
+
+
+@objMethod(Table, name='group', arg_names=['column'],
+           modifiers={'sum': none, 'mean': none, 'min': none, 'max': none},
+           flags=['count'])
+def table_group(self, args, modifiers, flags):
+    # t.group['dept' ~sum << ['pay', 'hours'] ~max << 'pay' ~count] has a
+    # row for each value of 'dept' and the columns dept, sum_pay,
+    # sum_hours, max_pay and count
+    table = args[instance]
+    name, kind, column = table.column(args['column'])
+    if kind == 'object':
+        raise TypeError('cannot group by the mixed column {!r}'.format(name))
+    keys, groups = numpy.unique(column, return_inverse=True)
+    groups = groups.ravel()
+    size = len(keys)
+    counts = numpy.bincount(groups, minlength=size)
+
+    result = {name: (kind, keys)}
+    for aggregate in ('sum', 'mean', 'min', 'max'):
+        names = self.parse(self.get_modifier(modifiers, aggregate))
+        if isinstance(names, NoneObject):
+            continue
+        for value_name in table_names(names):
+            value_name, value_kind, values = table.column(
+                String(Token(STR, value_name)))
+            if value_kind != 'number':
+                raise TypeError('cannot find the {} of the {} column {!r}'
+                                .format(aggregate, value_kind, value_name))
+            present = ~numpy.isnan(values)
+            # none values are left out
+            if aggregate in ('sum', 'mean'):
+                totals = numpy.bincount(groups, minlength=size,
+                                        weights=numpy.where(present,
+                                                            values, 0))
+                if aggregate == 'mean':
+                    with numpy.errstate(invalid='ignore',
+                                        divide='ignore'):
+                        totals = totals / numpy.bincount(groups,
+                                                         minlength=size,
+                                                         weights=present)
+            else:
+                totals = numpy.full(size, numpy.nan)
+                reduce = numpy.fmin if aggregate == 'min' else numpy.fmax
+                reduce.at(totals, groups, values)
+            result['{}_{}'.format(aggregate, value_name)] = 'number', totals
+
+    if self.parse(flags['count']):
+        result['count'] = 'number', counts.astype(float)
+    return Table(result)
+
+
+Table.__namespace__ = {
+    'columns': table_columns,
+    'column': table_get_column,
+    'select': table_select,
+    'where': table_where,
+    'sort': table_sort,
+    'group': table_group,
+    }
+
+
+class RecordFields:
+    # the namespace of a Record, which gets and sets its fields' slots
+
+    __slots__ = ('record',)
+
+    def __init__(self, record):
+        self.record = record
+
+    def __getitem__(self, name):
+        return getattr(self.record, self.record.record_type.positions[name])
+
+    def __setitem__(self, name, value):
+        record_type = self.record.record_type
+        if name not in record_type.positions:
+            raise NameError('{} has no field {!r}'.format(record_type.value,
+                                                         name))
+        setattr(self.record, record_type.positions[name], value)
+
+
+class Record(Type):
+    # Records are made by a RecordType, whose class for them keeps each
+    # field in a slot - they have no token or dict of their own
+
+    __slots__ = ()
+    record_type = None
+
+    def __init__(self, values):
+        for slot, value in zip(self.record_type.slots, values):
+            setattr(self, slot, value)
+
+    @property
+    def token(self):
+        return self.record_type.token
+
+    @property
+    def value(self):
+        return tuple(getattr(self, slot) for slot in self.record_type.slots)
+
+    @property
+    def __namespace__(self):
+        return RecordFields(self)
+
+
+class Map(Type):
+
+    function = MapFunction()
+
+    def __init__(self, items):
+        msg = 'expected python <dict> type, got <{}>'
+        Type.__init__(self, Token(MAP, items),
+                            error_msg=msg,
+                            expected_type=dict)
+        self.__namespace__ = Namespace(self, Map)
+
+
+def map_key(key):
+    if not isinstance(key, (Number, String, NoneObject)):
+        raise TypeError('Map keys must be Numbers, Strings, Booleans or '
+                        'none, got {}'.format(key.__class__.__name__))
+    return key
+
+
+@objMethod(Map, name='get', arg_names=['key'], modifiers={'default': none})
+def map_get(self, args, modifiers, flags):
+    default = self.parse(self.get_modifier(modifiers, 'default'))
+    return args[instance].value.get(map_key(args['key']), default)
+
+
+@objMethod(Map, name='set', arg_names=['key', 'value'])
+def map_set(self, args, modifiers, flags):
+    args[instance].value[map_key(args['key'])] = args['value']
+    return none
+
+
+@objMethod(Map, name='remove', arg_names=['key'])
+def map_remove(self, args, modifiers, flags):
+    try:
+        return args[instance].value.pop(map_key(args['key']))
+    except KeyError:
+        raise TypeError('key {} is not in the Map'
+                        .format(args['key'])) from None
+
+
+@objMethod(Map, name='contains', arg_names=['key'])
+def map_contains(self, args, modifiers, flags):
+    return true if map_key(args['key']) in args[instance].value else false
+
+
+@objMethod(Map, name='keys')
+def map_keys(self, args, modifiers, flags):
+    return List(Token(LIST, list(args[instance].value.keys())))
+
+
+@objMethod(Map, name='values')
+def map_values(self, args, modifiers, flags):
+    return List(Token(LIST, list(args[instance].value.values())))
+
+
+Map.__namespace__ = {
+    'get': map_get,
+    'set': map_set,
+    'remove': map_remove,
+    'contains': map_contains,
+    'keys': map_keys,
+    'values': map_values,
+    }
+
+
+class Set(Type):
+
+    function = SetFunction()
+
+    def __init__(self, items):
+        msg = 'expected python <set> type, got <{}>'
+        Type.__init__(self, Token(SET, items),
+                            error_msg=msg,
+                            expected_type=set)
+        self.__namespace__ = Namespace(self, Set)
+
+
+def set_key(value, parents=()):
+    # like map_key, but a List (e.g. each item of Indexed[...]) can be in a
+    # Set too - it is copied (with any Strings in it) and frozen, so
+    # changing the List later can't change the hash of the one in the Set
+    if isinstance(value, List):
+        if any(value is parent for parent in parents):
+            raise TypeError('a List which contains itself cannot be in a '
+                            'Set')
+        parents += (value,)
+        key = List(Token(LIST, [set_key(item, parents) for item in value]))
+        key.frozen = True
+        return key
+    if parents and isinstance(value, String):
+        return String(Token(STR, value.value))
+    return map_key(value)
+
+
+def set_values(iterables):
+    # a python set of all the items of the given Leaf iterables
+    items = set()
+    for iterable in iterables:
+        if isinstance(iterable, Set):
+            items |= iterable.value
+        elif isinstance(iterable, Map):
+            items.update(iterable.value.keys())
+        elif isinstance(iterable, String):
+            items.update(String(Token(STR, char))
+                         for char in set(iterable.value))
+        else:
+            items.update(set_key(item) for item in iterable)
+    return items
+
+
+@objMethod(Set, name='add', arg_names=['value'])
+def set_add(self, args, modifiers, flags):
+    args[instance].value.add(set_key(args['value']))
+    return none
+
+
+@objMethod(Set, name='remove', arg_names=['value'])
+def set_remove(self, args, modifiers, flags):
+    try:
+        args[instance].value.remove(set_key(args['value']))
+    except KeyError:
+        raise TypeError('{} is not in the Set'
+                        .format(args['value'])) from None
+    return none
+
+
+@objMethod(Set, name='contains', arg_names=['value'])
+def set_contains(self, args, modifiers, flags):
+    return true if set_key(args['value']) in args[instance].value else false
+
+
+@objMethod(Set, arbitrary=True)
+def union(self, args, modifiers, flags):
+    return Set(args[instance].value.union(set_values(args[arbitrary])))
+
+
+@objMethod(Set, arbitrary=True)
+def intersection(self, args, modifiers, flags):
+    return Set(args[instance].value.intersection(
+        *[set_values([iterable]) for iterable in args[arbitrary]]))
+
+
+@objMethod(Set, arbitrary=True)
+def difference(self, args, modifiers, flags):
+    return Set(args[instance].value.difference(set_values(args[arbitrary])))
+
+
+Set.__namespace__ = {
+    'add': set_add,
+    'remove': set_remove,
+    'contains': set_contains,
+    'union': union,
+    'intersection': intersection,
+    'difference': difference,
+    }
+
+
+class Deque(Type):
+
+    function = DequeFunction()
+
+    def __init__(self, items):
+        msg = 'expected python <collections.deque> type, got <{}>'
+        Type.__init__(self, Token(DEQUE, items),
+                            error_msg=msg,
+                            expected_type=collections.deque)
+        self.__namespace__ = Namespace(self, Deque)
+
+
+def deque_end(obj, end, pop):
+    # the item at one end of a Deque, removing it if 'pop' is true
+    if not obj.value:
+        raise TypeError('{} from an empty Deque'
+                        .format('pop' if pop else 'peek'))
+    if pop:
+        return obj.value.popleft() if end == 0 else obj.value.pop()
+    return obj.value[end]
+
+
+@objMethod(Deque, name='push', arg_names=['item'])
+def deque_push(self, args, modifiers, flags):
+    args[instance].value.append(args['item'])
+    return none
+
+
+@objMethod(Deque, name='push_left', arg_names=['item'])
+def deque_push_left(self, args, modifiers, flags):
+    args[instance].value.appendleft(args['item'])
+    return none
+
+
+@objMethod(Deque, name='pop')
+def deque_pop(self, args, modifiers, flags):
+    return deque_end(args[instance], -1, True)
+
+
+@objMethod(Deque, name='pop_left')
+def deque_pop_left(self, args, modifiers, flags):
+    return deque_end(args[instance], 0, True)
+
+
+@objMethod(Deque, name='peek')
+def deque_peek(self, args, modifiers, flags):
+    return deque_end(args[instance], -1, False)
+
+
+@objMethod(Deque, name='peek_left')
+def deque_peek_left(self, args, modifiers, flags):
+    return deque_end(args[instance], 0, False)
+
+
+Deque.__namespace__ = {
+    'push': deque_push,
+    'push_left': deque_push_left,
+    'pop': deque_pop,
+    'pop_left': deque_pop_left,
+    'peek': deque_peek,
+    'peek_left': deque_peek_left,
+    }
+
+
+class Heap(Type):
+
+    function = HeapFunction()
+
+    def __init__(self, key=None):
+        # the python list holds (key, count, item) entries - the count
+        # keeps equal keys in the order they were pushed, so items are
+        # never compared themselves
+        Type.__init__(self, Token(HEAP, []))
+        self.key = key
+        self.kind = None
+        self.count = itertools.count()
+        self.__namespace__ = Namespace(self, Heap)
+
+    def entry(self, item):
+        key = item if self.key is None else self.key(item)
+        if isinstance(key, Number):
+            kind = Number
+        elif isinstance(key, String):
+            kind = String
+        else:
+            raise TypeError('Heap keys must be Numbers or Strings, got {}'
+                            .format(key.__class__.__name__))
+        if self.kind is None:
+            self.kind = kind
+        elif kind is not self.kind:
+            raise TypeError('a Heap cannot have a mix of Number and String '
+                            'keys')
+        return key.value, next(self.count), item
+
+
+@objMethod(Heap, name='push', arg_names=['item'])
+def heap_push(self, args, modifiers, flags):
+    heap = args[instance]
+    heapq.heappush(heap.value, heap.entry(args['item']))
+    return none
+
+
+@objMethod(Heap, name='pop')
+def heap_pop(self, args, modifiers, flags):
+    if not args[instance].value:
+        raise TypeError('pop from an empty Heap')
+    return heapq.heappop(args[instance].value)[2]
+
+
+@objMethod(Heap, name='peek')
+def heap_peek(self, args, modifiers, flags):
+    if not args[instance].value:
+        raise TypeError('peek from an empty Heap')
+    return args[instance].value[0][2]
+
+
+Heap.__namespace__ = {
+    'push': heap_push,
+    'pop': heap_pop,
+    'peek': heap_peek,
+    }
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pattern(pattern, options):
+    # Regex[...] in a loop only compiles its pattern the first time
+    try:
+        return re.compile(pattern, options)
+    except re.error as e:
+        raise SyntaxError('invalid Regex pattern {!r}: {}'
+                          .format(pattern, e)) from None
+
+
+class Regex(Type):
+
+    function = RegexFunction()
+
+    def __init__(self, pattern):
+        msg = 'expected python <re.Pattern> type, got <{}>'
+        Type.__init__(self, Token(REGEX, pattern),
+                            error_msg=msg,
+                            expected_type=re.Pattern)
+        self.__namespace__ = Namespace(self, Regex)
+
+
+class Matches(Type):
+
+    def __init__(self, regex, string):
+        Type.__init__(self, Token(MATCHES, regex))
+        self.regex = regex
+        self.string = string
+
+
+def match_value(match):
+    # a match is a List of the whole match followed by its groups (none
+    # for groups that didn't take part in it), or none if there wasn't one
+    if match is None:
+        return none
+    return List(Token(LIST, [none if group is None
+                             else String(Token(STR, group))
+                             for group in (match.group(0),
+                                           *match.groups())]))
+
+
+@objMethod(Regex, name='match', arg_names=['string'])
+def regex_match(self, args, modifiers, flags):
+    # only matches at the start of the String
+    return match_value(args[instance].value
+                       .match(string_value(args['string'])))
+
+
+@objMethod(Regex, name='search', arg_names=['string'])
+def regex_search(self, args, modifiers, flags):
+    return match_value(args[instance].value
+                       .search(string_value(args['string'])))
+
+
+@objMethod(Regex, name='findall', arg_names=['string'])
+def regex_findall(self, args, modifiers, flags):
+    return Matches(args[instance], string_value(args['string']))
+
+
+@objMethod(Regex, name='sub', arg_names=['replacement', 'string'],
+           modifiers={'limit': none})
+def regex_sub(self, args, modifiers, flags):
+    # the replacement is a String (which can use \1 etc. for groups) or a
+    # function which is called with each match
+    replacement = args['replacement']
+    if not isinstance(replacement, String):
+        call = prepare_call(replacement, 1)
+        replacement = lambda match: string_value(call(match_value(match)))
+    else:
+        replacement = replacement.value
+
+    string = string_value(args['string'])
+    limit = string_limit(self.parse(self.get_modifier(modifiers, 'limit')))
+    if limit == 0:
+        return args['string']
+    try:
+        result = args[instance].value.sub(replacement, string, max(limit, 0))
+        # python uses a count of 0 for no limit
+    except re.error as e:
+        raise SyntaxError('invalid Regex replacement: {}'.format(e)) from None
+    return String(Token(STR, result))
+
+
+@objMethod(Regex, name='split', arg_names=['string'],
+           modifiers={'limit': none})
+def regex_split(self, args, modifiers, flags):
+    limit = string_limit(self.parse(self.get_modifier(modifiers, 'limit')))
+    string = string_value(args['string'])
+    if limit == 0:
+        return List(Token(LIST, [args['string']]))
+    parts = args[instance].value.split(string, max(limit, 0))
+    return List(Token(LIST, [none if part is None
+                             else String(Token(STR, part))
+                             for part in parts]))
+
+
+Regex.__namespace__ = {
+    'match': regex_match,
+    'search': regex_search,
+    'findall': regex_findall,
+    'sub': regex_sub,
+    'split': regex_split,
+    }
+
+
+class Bytes(Type):
+
+    function = BytesFunction()
+
+    def __init__(self, view, source=None):
+        # 'source' is the mmap the memoryview is of, if there is one
+        msg = 'expected python <memoryview> type, got <{}>'
+        Type.__init__(self, Token(BYTES, view),
+                            error_msg=msg,
+                            expected_type=memoryview)
+        self.source = source
+        self.__namespace__ = Namespace(self, Bytes)
+
+    def item(self, index):
+        try:
+            return Number(Token(NUM, decimal.Decimal(self.value[index])))
+        except IndexError:
+            raise TypeError('Bytes index out of range') from None
+
+    def slice(self, start=None, stop=None, step=None):
+        # a view of the same memory, not a copy
+        return Bytes(self.value[start:stop:step], self.source)
+
+    def buffer(self):
+        # something re can search without copying (a strided slice has to
+        # be copied first)
+        return self.value if self.value.contiguous else self.value.tobytes()
+
+
+def byte_value(obj):
+    if (not isinstance(obj, Number) or isinstance(obj, Boolean)
+        or not obj.is_integer() or not 0 <= obj.value <= 255):
+        raise TypeError('a byte must be a whole Number from 0 to 255, got {}'
+                        .format(obj))
+    return int(obj)
+
+
+def bytes_pattern(sub):
+    # a compiled pattern which finds the String (as utf-8) or Bytes 'sub'
+    if isinstance(sub, String):
+        data = sub.value.encode('utf-8')
+    elif isinstance(sub, Bytes):
+        data = sub.value.tobytes()
+    else:
+        raise TypeError('expected String or Bytes type, got {}'
+                        .format(type(sub).__name__))
+    return literal_pattern(data)
+
+
+@functools.lru_cache(maxsize=256)
+def literal_pattern(data):
+    # kept apart from compile_pattern, so finding many different Bytes
+    # doesn't push the Regex patterns used in a loop out of its cache
+    return re.compile(re.escape(data))
+
+
+@objMethod(Bytes, name='decode',
+           modifiers={'encoding': String(Token(STR, 'utf-8'))})
+def bytes_decode(self, args, modifiers, flags):
+    encoding = string_value(self.parse(self.get_modifier(modifiers,
+                                                         'encoding')))
+    try:
+        return String(Token(STR, str(args[instance].buffer(), encoding)))
+    except (LookupError, UnicodeError) as e:
+        raise TypeError('cannot decode Bytes: {}'.format(e)) from None
+
+
+@objMethod(Bytes, name='find', arg_names=['sub'],
+           modifiers={'start': none})
+def bytes_find(self, args, modifiers, flags):
+    # the position of the first 'sub', or -1 if there isn't one
+    obj = args[instance]
+    start = string_bound(self.parse(self.get_modifier(modifiers, 'start')))
+    start = slice(start, None).indices(len(obj.value))[0]
+    match = bytes_pattern(args['sub']).search(obj.buffer(), start)
+    position = -1 if match is None else match.start()
+    return Number(Token(NUM, decimal.Decimal(position)))
+
+
+@objMethod(Bytes, name='count', arg_names=['sub'])
+def bytes_count(self, args, modifiers, flags):
+    pattern = bytes_pattern(args['sub'])
+    count = sum(1 for match in pattern.finditer(args[instance].buffer()))
+    return Number(Token(NUM, decimal.Decimal(count)))
+
+
+@objMethod(Bytes, name='set', arg_names=['index', 'value'])
+def bytes_set(self, args, modifiers, flags):
+    obj = args[instance]
+    if obj.value.readonly:
+        raise TypeError('{} is read only'.format(obj))
+    index = args['index']
+    if not isinstance(index, Number) or not index.is_integer():
+        raise TypeError('Bytes indices must be integer Numbers')
+    try:
+        obj.value[int(index)] = byte_value(args['value'])
+    except IndexError:
+        raise TypeError('Bytes index out of range') from None
+    return none
+
+
+@objMethod(Bytes, name='list')
+def bytes_list(self, args, modifiers, flags):
+    return List(Token(LIST, list(args[instance])))
+
+
+@objMethod(Bytes, name='flush')
+def bytes_flush(self, args, modifiers, flags):
+    # writes changes to a mapped file back to disk
+    obj = args[instance]
+    if obj.source is not None and not obj.value.readonly:
+        obj.source.flush()
+    return none
+
+
+Bytes.__namespace__ = {
+    'decode': bytes_decode,
+    'find': bytes_find,
+    'count': bytes_count,
+    'set': bytes_set,
+    'list': bytes_list,
+    'flush': bytes_flush,
+    }
+
+
+def json_constant(name):
+    raise SyntaxError('invalid JSON: {} is not a number'.format(name))
+
+
+def from_json(value):
+    # the Leaf value for something python's json module has read (with
+    # numbers as Decimals)
+    if isinstance(value, str):
+        return String(Token(STR, value))
+    elif isinstance(value, bool):
+        return true if value else false
+    elif isinstance(value, decimal.Decimal):
+        return Number(Token(NUM, value))
+    elif value is None:
+        return none
+    elif isinstance(value, list):
+        return List(Token(LIST, [from_json(item) for item in value]))
+    return Map({String(Token(STR, key)): from_json(item)
+                for key, item in value.items()})
+
+
+def to_json(obj, parts, indent, level):
+    # adds the JSON text for a Leaf value to 'parts'
+    if isinstance(obj, Boolean):
+        parts.append('true' if obj.value else 'false')
+    elif isinstance(obj, Number):
+        if not obj.value.is_finite():
+            raise TypeError('{} cannot be written as JSON'.format(obj))
+        parts.append(str(obj.value))
+    elif isinstance(obj, String):
+        parts.append(json.dumps(obj.value))
+    elif isinstance(obj, NoneObject):
+        parts.append('null')
+    elif isinstance(obj, Map):
+        items = list(obj.value.items())
+        json_container(items, parts, indent, level, '{}',
+                       lambda item: json_pair(item, parts, indent, level + 1))
+    elif isinstance(obj, (List, Set, Range, Array, Table, Record, Deque,
+                          Heap)):
+        # only values which can be iterated over again are JSON arrays - a
+        # File, Rows or Generator would be used up before finding out
+        items = list(obj)
+        json_container(items, parts, indent, level, '[]',
+                       lambda item: to_json(item, parts, indent, level + 1))
+    else:
+        raise TypeError('{} cannot be written as JSON'
+                        .format(obj.__class__.__name__))
+
+
+def json_pair(item, parts, indent, level):
+    key, value = item
+    if isinstance(key, String):
+        parts.append(json.dumps(key.value))
+    elif isinstance(key, Number) and not isinstance(key, Boolean):
+        parts.append(json.dumps(str(key.value)))
+    else:
+        raise TypeError('JSON keys must be Strings or Numbers, got {}'
+                        .format(key.__class__.__name__))
+    parts.append(': ')
+    to_json(value, parts, indent, level)
+
+
+def json_container(items, parts, indent, level, brackets, add_item):
+    if not items:
+        parts.append(brackets)
+        return
+    if indent is None:
+        separator = ', '
+        parts.append(brackets[0])
+    else:
+        separator = ',\n' + ' ' * (indent * (level + 1))
+        parts.append(brackets[0] + separator[1:])
+    for i, item in enumerate(items):
+        if i:
+            parts.append(separator)
+        add_item(item)
+    if indent is not None:
+        parts.append('\n' + ' ' * (indent * level))
+    parts.append(brackets[1])
+
+
+def csv_field(kind):
+    # the function which converts a field of a column of type 'kind'
+    if not isinstance(kind, String) or kind.value not in csv_fields:
+        raise TypeError("column types must be 'number', 'string' or "
+                        "'boolean', got {}".format(kind))
+    return csv_fields[kind.value]
+
+
+def csv_boolean(field):
+    if field not in ('true', 'false'):
+        raise TypeError('invalid value to convert to Boolean: {!r}'
+                        .format(field))
+    return true if field == 'true' else false
+
+
+csv_fields = {
+    'number': lambda field: number_from_string(field) if field else none,
+    'string': lambda field: String(Token(STR, field)),
+    'boolean': csv_boolean,
+    }
+
+
+class Rows(Type):
+
+    function = CsvReadFunction()
+
+    def __init__(self, source, types, sep, header, record=None):
+        Type.__init__(self, Token(ROWS, source))
+        self.source = source
+        self.types = types
+        self.sep = sep
+        self.header = header
+        self.record = record
+
+    def converters(self, width):
+        # one conversion function per column, worked out once per file
+        if isinstance(self.types, NoneObject):
+            return [csv_fields['string']] * width
+        if isinstance(self.types, String):
+            return [csv_field(self.types)] * width
+        converters = [csv_field(kind) for kind in self.types]
+        if len(converters) != width:
+            raise TypeError('~types has {} columns but the CSV has {}'
+                            .format(len(converters), width))
+        return converters
+
+    def rows(self):
+        if isinstance(self.source, File):
+            lines = self.source.reader()
+        else:
+            try:
+                lines = open(self.source, encoding='utf-8', newline='',
+                             buffering=File.read_buffer)
+            except OSError as e:
+                raise FileNotFoundError('cannot open {!r}: {}'
+                                        .format(self.source, e.strerror)
+                                        ) from None
+        try:
+            reader = csv.reader(lines, delimiter=self.sep)
+            names = None
+            if self.header:
+                names = [String(Token(STR, name))
+                         for name in next(reader, [])]
+            converters = None
+            for row in reader:
+                if converters is None:
+                    converters = self.converters(len(row))
+                    if (self.record is not None
+                        and len(converters) != len(self.record.fields)):
+                        raise TypeError('{} has {} fields but the CSV has {} '
+                                        'columns'.format(self.record.value,
+                                                         len(self.record
+                                                             .fields),
+                                                         len(converters)))
+                if len(row) != len(converters):
+                    raise TypeError('line {} of the CSV has {} columns, '
+                                    'expected {}'.format(reader.line_num,
+                                                         len(row),
+                                                         len(converters)))
+                values = [convert(field)
+                          for convert, field in zip(converters, row)]
+                if self.record is not None:
+                    yield self.record.make(values)
+                elif names is None:
+                    yield List(Token(LIST, values))
+                else:
+                    yield Map(dict(zip(names, values)))
+            if isinstance(self.source, File):
+                self.source.finish()
+        finally:
+            if not isinstance(self.source, File):
+                lines.close()
+
+
+database_connections = {}
+# one sqlite3 connection for each database path, shared between Database
+# objects for that path - every Database[':memory:'] is a database of its
+# own, so it keeps its connection to itself
+
+
+class Database(Type):
+
+    function = DatabaseFunction()
+    cached_statements = 256
+    # how many prepared statements sqlite3 keeps for each connection
+
+    def __init__(self, path):
+        Type.__init__(self, Token(DATABASE, path))
+        self.private = None
+        self.__namespace__ = Namespace(self, Database)
+
+    def connection(self):
+        if self.value == ':memory:':
+            if self.private is None:
+                self.private = self.connect()
+            return self.private
+        connection = database_connections.get(self.value)
+        if connection is None:
+            connection = self.connect()
+            database_connections[self.value] = connection
+        return connection
+
+    def connect(self):
+        # columns declared as 'decimal text' give back the exact Numbers
+        # to_sql stores for them as text ('text' stops SQLite turning them
+        # into floats itself)
+        try:
+            return sqlite3.connect(
+                self.value, cached_statements=Database.cached_statements,
+                detect_types=sqlite3.PARSE_DECLTYPES)
+        except sqlite3.Error as e:
+            raise FileNotFoundError('cannot open database {!r}: {}'
+                                    .format(self.value, e)) from None
+
+    def close(self):
+        # closes the connection without committing
+        if self.value == ':memory:':
+            connection, self.private = self.private, None
+        else:
+            connection = database_connections.pop(self.value, None)
+        if connection is not None:
+            connection.close()
+
+
+class Results(Type):
+
+    batch_size = 256
+    # how many rows are fetched from the database at a time
+
+    def __init__(self, database, cursor):
+        Type.__init__(self, Token(RESULTS, cursor))
+        self.database = database
+        self.cursor = cursor
+
+
+def to_sql(obj):
+    # the python value sqlite3 stores for a Leaf value
+    if isinstance(obj, Boolean):
+        return 1 if obj.value else 0
+    elif isinstance(obj, Number):
+        if obj.is_integer():
+            return int(obj)
+        # a Number which a float would change (e.g. 0.1000000000000000001)
+        # is stored as text, so it isn't rounded
+        value = float(obj)
+        if decimal.Decimal(repr(value)) == obj.value:
+            return value
+        return str(obj.value)
+    elif isinstance(obj, String):
+        return obj.value
+    elif isinstance(obj, NoneObject):
+        return None
+    elif isinstance(obj, Bytes):
+        return obj.buffer()
+    raise TypeError('{} cannot be stored in a Database'
+                    .format(obj.__class__.__name__))
+
+
+def sql_decimal(data):
+    # reads a value of a 'decimal text' column back into a Decimal
+    text = data.decode('utf-8')
+    try:
+        return decimal.Decimal(text)
+    except decimal.InvalidOperation:
+        return text
+
+
+sqlite3.register_converter('decimal', sql_decimal)
+
+
+def from_sql(value):
+    if isinstance(value, int):
+        return Number(Token(NUM, decimal.Decimal(value)))
+    elif isinstance(value, decimal.Decimal):
+        return Number(Token(NUM, value))
+    elif isinstance(value, float):
+        return from_python_number(value)
+    elif isinstance(value, str):
+        return String(Token(STR, value))
+    elif value is None:
+        return none
+    return Bytes(memoryview(value))
+
+
+@objMethod(Database, name='execute', arg_names=['sql'], arbitrary=True)
+def database_execute(self, args, modifiers, flags):
+    # runs 'sql' with the rest of the arguments in place of its ?s - the
+    # rows it gives are fetched as the Results are iterated over
+    database = args[instance]
+    parameters = [to_sql(self.parse(arg)) for arg in args[arbitrary]]
+    try:
+        cursor = database.connection().execute(string_value(args['sql']),
+                                               parameters)
+    except sqlite3.Error as e:
+        raise TypeError('database error: {}'.format(e)) from None
+    return Results(database, cursor)
+
+
+@objMethod(Database, name='executemany', arg_names=['sql', 'rows'])
+def database_executemany(self, args, modifiers, flags):
+    # runs 'sql' once for each row (an iterable of values for its ?s) of
+    # 'rows' in a single call, which is much faster for inserts - gives
+    # the number of rows changed
+    rows = ([to_sql(value) for value in row] for row in args['rows'])
+    try:
+        cursor = args[instance].connection().executemany(
+            string_value(args['sql']), rows)
+    except sqlite3.Error as e:
+        raise TypeError('database error: {}'.format(e)) from None
+    return Number(Token(NUM, decimal.Decimal(cursor.rowcount)))
+
+
+@objMethod(Database, name='commit')
+def database_commit(self, args, modifiers, flags):
+    args[instance].connection().commit()
+    return none
+
+
+@objMethod(Database, name='rollback')
+def database_rollback(self, args, modifiers, flags):
+    args[instance].connection().rollback()
+    return none
+
+
+@objMethod(Database, name='close')
+def database_close(self, args, modifiers, flags):
+    # closes the connection without committing - the next use of this
+    # path opens a new one
+    args[instance].close()
+    return none
+
+
+Database.__namespace__ = {
+    'execute': database_execute,
+    'executemany': database_executemany,
+    'commit': database_commit,
+    'rollback': database_rollback,
+    'close': database_close,
+    }
+
+
+class File(Type):
+
+    function = FileFunction()
+    read_buffer = 1 << 16
+    # files are read from disk in chunks of this many bytes
+
+    def __init__(self, path, mode='r'):
+        Type.__init__(self, Token(FILE, path))
+        self.mode = mode
+        self.finished = False
+        try:
+            # line endings are left as they are when reading, so a CSV
+            # field can hold a newline - strip and read take them off
+            self.stream = open(path, mode, encoding='utf-8',
+                               newline='' if mode == 'r' else None,
+                               buffering=File.read_buffer)
+        except OSError as e:
+            raise FileNotFoundError('cannot open {!r}: {}'
+                                    .format(path, e.strerror)) from None
+
+        if mode == 'r':
+            self.writer = None
+        else:
+            self.writer = OutputBuffer(self.stream, output.size)
+            open_files.append(self)
+        self.__namespace__ = Namespace(self, File)
+
+    def reader(self):
+        if self.writer is not None:
+            raise TypeError('cannot read from {}, it was opened for writing'
+                            .format(self))
+        if self.finished:
+            # read to the end and closed, so there is nothing left
+            return io.StringIO()
+        if self.stream.closed:
+            raise TypeError('cannot read from {}, it is closed'.format(self))
+        return self.stream
+
+    def finish(self):
+        # called once the whole file has been read, so the file is closed
+        # then rather than whenever the File is collected
+        self.finished = True
+        self.stream.close()
+
+    def read(self):
+        text = self.reader().read()
+        self.finish()
+        return text.replace('\r\n', '\n').replace('\r', '\n')
+
+    @staticmethod
+    def strip(line):
+        # a line without its '\n', '\r\n' or '\r' ending
+        if line.endswith('\r\n'):
+            return line[:-2]
+        if line.endswith(('\n', '\r')):
+            return line[:-1]
+        return line
+
+    def write(self, text):
+        if self.writer is None:
+            raise TypeError('cannot write to {}, it was opened for reading'
+                            .format(self))
+        if self.stream.closed:
+            raise TypeError('cannot write to {}, it is closed'.format(self))
+        self.writer.write(text)
+
+    def close(self):
+        if self.writer is not None and not self.stream.closed:
+            self.writer.flush()
+            open_files.remove(self)
+        self.stream.close()
+
+
+@objMethod(File, name='read')
+def file_read(self, args, modifiers, flags):
+    # the rest of the file as a single String
+    return String(Token(STR, args[instance].read()))
+
+
+@objMethod(File, name='readline')
+def file_readline(self, args, modifiers, flags):
+    # the next line without its newline, or none at the end of the file
+    file = args[instance]
+    line = file.reader().readline()
+    if not line:
+        file.finish()
+        return none
+    return String(Token(STR, File.strip(line)))
+
+
+@objMethod(File, name='write', arbitrary=True,
+           modifiers={'sep': String(Token(STR, ''))})
+def file_write(self, args, modifiers, flags):
+    sep = str(self.parse(self.get_modifier(modifiers, 'sep')))
+    args[instance].write(sep.join(str(self.parse(arg))
+                                  for arg in args[arbitrary]))
+    return none
+
+
+@objMethod(File, name='flush')
+def file_flush(self, args, modifiers, flags):
+    file = args[instance]
+    if file.writer is not None and not file.stream.closed:
+        file.writer.flush()
+    return none
+
+
+@objMethod(File, name='close')
+def file_close(self, args, modifiers, flags):
+    args[instance].close()
+    return none
+
+
+File.__namespace__ = {
+    'read': file_read,
+    'readline': file_readline,
+    'write': file_write,
+    'flush': file_flush,
+    'close': file_close,
+    }
+
+
+class Range(Type):
+
+    function = RangeFunction()
+
+    def __init__(self, start, stop, step=decimal.Decimal(1)):
+        # 'start >> stop >> step' - stop is not included, like Indexed
+        # counting from 0
+        if step == 0:
+            raise TypeError('Range step cannot be zero')
+        Type.__init__(self, Token(RANGE, (start, stop, step)))
+        self.start = start
+        self.stop = stop
+        self.step = step
+        self.length = max(0, int(((stop - start) / step)
+                                 .to_integral_value(decimal.ROUND_CEILING)))
+
+    def values(self):
+        # the python values of the Range, counted with an int where possible
+        start, step = self.start, self.step
+        if start == int(start) and step == int(step):
+            for i in range(int(start), int(start) + self.length * int(step),
+                           int(step)):
+                yield decimal.Decimal(i)
+        else:
+            for i in range(self.length):
+                yield start + i * step
+
+    def item(self, index):
+        try:
+            i = range(self.length)[index]
+        except IndexError:
+            raise TypeError('Range index out of range') from None
+        return Number(Token(NUM, self.start + i * self.step))
+
+    def slice(self, start=None, stop=None, step=None):
+        positions = range(self.length)[start:stop:step]
+        return Range(self.start + positions.start * self.step,
+                     self.start + positions.stop * self.step,
+                     positions.step * self.step)
+
+
+def prepare_call(function, count):
+    # returns a python function that calls the Leaf 'function' with
+    # 'count' values - the arguments are matched to the function's
+    # parameters once here instead of on every call
+    if isinstance(function, type) and hasattr(function, 'function'):
+        function = function.function   # e.g. String -> String[...]
+    if not isinstance(function, Function):
+        raise TypeError('expected a function, got {}'
+                        .format(function.__class__.__name__))
+
+    bound = {}
+    parameters = function.arg_names
+    if isinstance(function, BoundMethod):
+        bound[instance] = function.instance
+        parameters = [name for name in parameters if name != instance]
+
+    if (len(parameters) > count
+        or (len(parameters) < count and not function.arbitrary)):
+        raise TypeError('{} expects {} arguments, but will be called with {}'
+                        .format(function.value, len(parameters), count))
+    names = parameters[:count]
+    default_flags = {flag: false for flag in function.flags}
+    extra = function.arbitrary
+
+    def call(*values):
+        args = dict(bound)
+        args.update(zip(names, values))
+        if extra:
+            args[arbitrary] = list(values[len(names):])
+        r = function(args, {}, dict(default_flags))
+        # functions get their own dicts as they may change them
+        return none if r is None else r
+
+    return call
+
+
+def aggregate_source(function, args):
+    # sum[iterable] aggregates the iterable's items, while sum[a, b, ...]
+    # aggregates the arguments themselves
+    iterable = function.parse(args['iterable'])
+    if args[arbitrary]:
+        return List(Token(LIST, [iterable, *[function.parse(i)
+                                             for i in args[arbitrary]]]))
+    return iterable
+
+
+def number_values(function, iterable):
+    # the python Decimals of an iterable of Numbers, collected in one loop
+    # so that aggregating them doesn't create a Number for every step
+    if isinstance(iterable, Range):
+        return list(iterable.values())
+    elif isinstance(iterable, Array):
+        return [decimal.Decimal(repr(value))
+                for value in iterable.value.ravel().tolist()]
+
+    values = []
+    append = values.append
+    for item in iterable:
+        if not isinstance(item, Number):
+            raise TypeError('{} expected Numbers, got {}'
+                            .format(function.value,
+                                    item.__class__.__name__))
+        append(item.value)
+    return values
+
+
+def sorted_values(items, key, reverse):
+    # sorts a python list of Leaf objects by their (or their key's) python
+    # value - the key function is called once for each item
+    if isinstance(key, NoneObject):
+        keys = items
+    else:
+        call = prepare_call(key, 1)
+        keys = [call(item) for item in items]
+
+    values = []
+    kinds = set()
+    for obj in keys:
+        if isinstance(obj, Number):
+            kinds.add(Number)
+        elif isinstance(obj, String):
+            kinds.add(String)
+        else:
+            raise TypeError('cannot sort by {} values'
+                            .format(obj.__class__.__name__))
+        values.append(obj.value)
+
+    if len(kinds) > 1:
+        raise TypeError('cannot sort a mix of Numbers and Strings')
+
+    order = sorted(range(len(items)), key=values.__getitem__,
+                   reverse=bool(reverse))
+    return [items[i] for i in order]
+
+
+class Mapped(Type):
+
+    function = MappedFunction()
+
+    def __init__(self, function, iterables):
+        Type.__init__(self, Token(MAPPED, iterables))
+        self.function = function
         self.iterables = iterables
+        self.call = prepare_call(function, len(iterables))
+
+
+class Filtered(Type):
+
+    function = FilteredFunction()
+
+    def __init__(self, function, iterable):
+        Type.__init__(self, Token(FILTERED, iterable))
+        self.function = function
+        self.iterable = iterable
+        self.call = prepare_call(function, 1)
+
+
+class GeneratorReturn(Exception):
+    # raised by 'return' in a generator function to stop its Generator
+    pass
+
+
+class Generator(Type):
+
+    def __init__(self, function, scope):
+        Type.__init__(self, Token(GENERATOR, function.value))
+        self.function = function
+        self.scope = scope
+        self.values = self.resume()
+
+    def resume(self):
+        # runs the function's body between 'yield's in its own scope,
+        # putting back the scope of whatever is iterating over it each time
+        # it yields a value
+        global current_scope
+        body = self.function.run(self.function.body)
+        scope = self.scope
+        while True:
+            outer_scope = current_scope
+            current_scope = scope
+            try:
+                value = next(body)
+            except (StopIteration, GeneratorReturn):
+                return
+            finally:
+                scope = current_scope
+                current_scope = outer_scope
+            yield value
 
 
 builtins = {
@@ -1827,6 +4971,35 @@ builtins = {
     'Indexed': IndexedFunction(),
     'Parallel': ParallelFunction(),
     'Chain': ChainFunction(),
+    'Array': ArrayFunction(),
+    'Table': TableFunction(),
+    'record': RecordFunction(),
+    'Map': MapFunction(),
+    'Set': SetFunction(),
+    'Deque': DequeFunction(),
+    'Heap': HeapFunction(),
+    'Range': RangeFunction(),
+    'Regex': RegexFunction(),
+    'File': FileFunction(),
+    'Bytes': BytesFunction(),
+    'mmap': MmapFunction(),
+    'csv_read': CsvReadFunction(),
+    'csv_write': CsvWriteFunction(),
+    'json_load': JsonLoadFunction(),
+    'json_dump': JsonDumpFunction(),
+    'Database': DatabaseFunction(),
+
+    'map': MappedFunction(),
+    'filter': FilteredFunction(),
+    'reduce': ReduceFunction(),
+    'sum': SumFunction(),
+    'mean': MeanFunction(),
+    'min': MinFunction(),
+    'max': MaxFunction(),
+    'count': CountFunction(),
+    'sort': SortFunction(),
+    'flush': FlushFunction(),
+    'buffering': BufferingFunction(),
 
     'true': true,
     'false': false,
@@ -1847,6 +5020,22 @@ builtin_types = {
     'Indexed': Indexed,
     'Parallel': Parallel,
     'Chain': Chain,
+    'Array': Array,
+    'Map': Map,
+    'Set': Set,
+    'Deque': Deque,
+    'Heap': Heap,
+    'Range': Range,
+    'Regex': Regex,
+    'Matches': Matches,
+    'File': File,
+    'Bytes': Bytes,
+    'Rows': Rows,
+    'Database': Database,
+    'Results': Results,
+    'Table': Table,
+    'Mapped': Mapped,
+    'Filtered': Filtered,
     }
 
 GLOBAL_SCOPE = ScopedSymbolTable('global', 1)
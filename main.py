@@ -34,6 +34,7 @@ if __name__ == '__main__':
     # lexer = Lexer('(5 + 5) * 5')
     while True:
         try:
+            leaf_interpreter.flush_output()
             text = input('>>> ')
             if text == 'exit':
                 sys.exit()